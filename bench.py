@@ -0,0 +1,317 @@
+"""
+Benchmarks for the report pipeline on synthetic data
+
+ex: python bench.py sizes=1000,100000 save_baseline
+    python bench.py sizes=1000,100000 compare
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+import openpyxl
+from datetime import datetime, timedelta
+import sheets
+
+COLORS = ["W", "G", "BL", "GR", "ES"]
+SIZES = [24, 30, 36, 48, 60]
+PIECE_PREFIXES = ["VA30", "VA31"]
+SINGLE_ITEMS = ["AB12", "CD34", "EF56", "GH78", "JK90"]
+CARRIERS = ["Fedex", "Ups", "Freight", "UNKWN"]
+STATUSES = ["Not Shipped", "Shipped", None]
+AS_OF = datetime(2022, 8, 1)
+
+
+def combos():
+    """
+    All the synthetic combos as (combo number, {piece: qty})
+    """
+
+    for prefix in PIECE_PREFIXES:
+        for big in SIZES:
+            for small in SIZES:
+                if small < big:
+                    yield f"{prefix}{big}-{big + small}", {f"{prefix}{big}": 1, f"{prefix}{small}": 1}
+
+
+def write_combo_lookup(path):
+    """
+    Generate a combo lookup sheet (headers on the first 3 rows like the real one)
+    """
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Combo Lookup"])
+    sheet.append([])
+    sheet.append(["Combo", "Piece 1", "Piece 2"])
+
+    for combo, pieces in combos():
+        # combos are looked up both with and without their color
+        for color in [""] + COLORS:
+            sheet.append([combo + color] + [f"{qty}pc {piece}" for piece, qty in pieces.items()])
+
+    workbook.save(path)
+
+
+def write_class_lookup(path):
+    """
+    Generate a class lookup sheet
+    """
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Class", "Items"])
+
+    for prefix in PIECE_PREFIXES:
+        for color in COLORS:
+            sheet.append([f"Vanity {prefix}", ":".join(f"{prefix}{size}-{color}" for size in SIZES) + "/synthetic"])
+
+    sheet.append(["Accessories", ":".join(SINGLE_ITEMS)])
+    workbook.save(path)
+
+
+def random_items(rng):
+    """
+    A random order's items: a combo, a single item or a special order
+    """
+
+    kind = rng.random()
+    color = rng.choice(COLORS)
+
+    if kind < 0.3:
+        combo, pieces = rng.choice(list(combos()))
+        qty = rng.choice([1, 1, 1, 2])
+        return [(f"{piece}-{color}", qty * piece_qty) for piece, piece_qty in pieces.items()]
+    elif kind < 0.4: # special order (mixed colors or non combo items)
+        return [(f"{rng.choice(PIECE_PREFIXES)}{rng.choice(SIZES)}-{rng.choice(COLORS)}", 1), (rng.choice(SINGLE_ITEMS), 1)]
+
+    num = rng.choice([f"{rng.choice(PIECE_PREFIXES)}{rng.choice(SIZES)}-{color}", rng.choice(SINGLE_ITEMS)])
+    return [(num, rng.randint(1, 3))]
+
+
+def write_report(path, rows, seed=0):
+    """
+    Generate a pending shipment report with `rows` orders (same columns `sheets.get_data` reads)
+    """
+
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["PO", "", "Order Date", "", "", "Carrier", "Status", "Warehouse", "", "", "Item", "Qty", ""])
+
+    for i in range(rows):
+        row = [
+            f"PO{i}",
+            None,
+            AS_OF - timedelta(days=rng.randint(0, 20)),
+            None,
+            None,
+            rng.choice(CARRIERS),
+            rng.choice(STATUSES),
+            rng.choice(sheets.WAREHOUSE_IDS),
+            None,
+            None,
+        ]
+
+        for num, qty in random_items(rng):
+            row.extend([num, qty, None])
+
+        sheet.append(row)
+
+    workbook.save(path)
+
+
+def generate(directory, rows):
+    """
+    Generate (or reuse) the synthetic sheets for a size, returning their paths
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "report": os.path.join(directory, f"report_{rows}.xlsx"),
+        "class_lookup": os.path.join(directory, "class_lookup.xlsx"),
+        "combo_lookup": os.path.join(directory, "combo_lookup.xlsx"),
+    }
+
+    if not os.path.exists(paths["report"]):
+        write_report(paths["report"], rows)
+
+    if not os.path.exists(paths["class_lookup"]):
+        write_class_lookup(paths["class_lookup"])
+
+    if not os.path.exists(paths["combo_lookup"]):
+        write_combo_lookup(paths["combo_lookup"])
+
+    return paths
+
+
+def measure(func, memory, repeat=1):
+    """
+    Run `func` `repeat` times, returning its result, the seconds the fastest run took (the least noisy)
+    and (with `memory`) the peak memory of one more run in MB
+    Garbage collection is paused while timing (like `timeit`), so a collection landing in one run doesn't skew it
+    """
+
+    seconds = None
+
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        gc.disable()
+
+        try:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    peak_mb = None
+
+    if memory:
+        tracemalloc.start()
+
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return result, seconds, peak_mb
+
+
+def run_stages(paths, directory, memory=True, repeat=1):
+    """
+    Time every stage of the pipeline on one synthetic report (the fastest of `repeat` runs of each)
+    """
+
+    class_lookup = sheets.load_class_lookup(paths["class_lookup"])
+    combo_lookup = sheets.load_combo_lookup(paths["combo_lookup"])
+    combo_index = sheets.ComboIndex(combo_lookup)
+    results = {}
+
+    def stage(name, func):
+        result, seconds, peak_mb = measure(func, memory, repeat)
+        results[name] = {"seconds": seconds, "peak_mb": peak_mb}
+        return result
+
+    def compute_uids():
+        table = sheets.ItemTable()
+
+        for po, carrier, status, warehouse, ship_status, items in data:
+            entry = sheets.Entry(table)
+
+            for num, qty in items:
+                entry.add_item(num, qty, ship_status, po, carrier, warehouse)
+
+            entry.compute_uid(combo_index)
+
+    def compute_qtys():
+        builder.compute_qtys()
+
+    def group():
+        grouped = sheets.ReportBuilder(sheets.WAREHOUSE_IDS, class_lookup, combo_lookup)
+        grouped.extend(data)
+        return grouped
+
+    data = stage("get_data", lambda: sheets.get_data(paths["report"], AS_OF))
+    stage("compute_uid", compute_uids)
+    builder = stage("group", group)
+    stage("compute_qtys", compute_qtys)
+    output_data = stage("parse_data", lambda: sheets.parse_data(data, sheets.WAREHOUSE_IDS, class_lookup, combo_lookup))
+    stage("write_data", lambda: sheets.write_data(output_data, os.path.join(directory, "output.xlsx")))
+    stage("write_data_streaming", lambda: sheets.write_data(output_data, os.path.join(directory, "output.xlsx"), True))
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds=0.0):
+    """
+    Returns a description of every stage that got slower (or used more memory) than the baseline by more than `tolerance`
+    (and, for times, by more than `min_seconds`, as stages of a few milliseconds are mostly noise)
+    """
+
+    regressions = []
+
+    for size, stages in results.items():
+        for name, result in stages.items():
+            base = baseline.get(size, {}).get(name)
+
+            if base is None:
+                continue
+
+            for metric in ("seconds", "peak_mb"):
+                floor = min_seconds if metric == "seconds" else 0.0
+
+                if result[metric] is not None and base[metric] and result[metric] > max(base[metric] * (1 + tolerance), base[metric] + floor):
+                    regressions.append(f"{size} rows, {name}: {metric} {base[metric]:.3f} -> {result[metric]:.3f}")
+
+    return regressions
+
+
+def parse_cmd_options():
+    """
+    Parse options passed from the command line
+    """
+
+    opts = {
+        "sizes": "1000,10000,100000", # comma separated numbers of report rows
+        "dir": "bench_data",          # where synthetic sheets and outputs are kept
+        "baseline": "bench_baseline.json",
+        "save_baseline": False,       # store the results as the new baseline
+        "compare": False,             # fail if a stage regressed against the baseline
+        "tolerance": 0.25,            # allowed slowdown before a stage counts as regressed
+        "repeat": 5,                  # times every stage is run (the fastest run is kept and compared)
+        "min_seconds": 0.01,          # slowdowns smaller than this many seconds are never regressions (timer noise)
+        "no_memory": False,           # skip the (slower) peak memory measurements
+        "reader": sheets.ROW_READER,  # backend used to read workbooks
+    }
+
+    for opt in sys.argv[1:]:
+        name, _, value = opt.partition("=")
+
+        if name not in opts:
+            continue
+
+        if isinstance(opts[name], bool):
+            opts[name] = True
+        elif value:
+            opts[name] = type(opts[name])(value)
+
+    return opts
+
+
+def main():
+    cmd_options = parse_cmd_options()
+    sheets.ROW_READER = cmd_options["reader"]
+    results = {}
+
+    for size in cmd_options["sizes"].split(","):
+        paths = generate(cmd_options["dir"], int(size))
+        results[size] = run_stages(paths, cmd_options["dir"], not cmd_options["no_memory"], cmd_options["repeat"])
+
+        for name, result in results[size].items():
+            peak = f"{result['peak_mb']:9.1f} MB" if result["peak_mb"] is not None else ""
+            print(f"{size:>8} rows  {name:<22}{result['seconds']:9.3f} s {peak}")
+
+    if cmd_options["save_baseline"]:
+        with open(cmd_options["baseline"], "w") as f:
+            json.dump(results, f, indent=4)
+
+    if cmd_options["compare"]:
+        with open(cmd_options["baseline"]) as f:
+            regressions = compare(results, json.load(f), cmd_options["tolerance"], cmd_options["min_seconds"])
+
+        for regression in regressions:
+            print(f"Regression: {regression}")
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
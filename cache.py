@@ -0,0 +1,122 @@
+"""
+Module for caching scraped orders between runs
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+def encode_order(order):
+    """
+    Convert an order (as returned by `orders.build_order`) to a json compatible list
+    """
+
+    order_time, po, carrier, status, warehouse, items = order
+    order_time = order_time.isoformat() if order_time is not None else None
+
+    return [order_time, po, carrier, status, warehouse, items]
+
+
+def decode_order(encoded):
+    """
+    Convert a list made by `encode_order` back to an order
+    """
+
+    order_time, po, carrier, status, warehouse, items = encoded
+    order_time = datetime.fromisoformat(order_time) if order_time is not None else None
+
+    return (order_time, po, carrier, status, warehouse, [tuple(item) for item in items])
+
+
+def dump_order(order):
+    """
+    Serialize an order to json
+    """
+
+    return json.dumps(encode_order(order))
+
+
+def load_order(raw):
+    """
+    Deserialize an order from json
+    """
+
+    return decode_order(json.loads(raw))
+
+
+class OrderCache(object):
+    """
+    An sqlite store of parsed orders keyed by site and order number
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                site TEXT NOT NULL,
+                order_num TEXT NOT NULL,
+                record TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (site, order_num)
+            )
+        """)
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get_fresh(self, site, order_nums, max_age):
+        """
+        Returns a dict of the cached orders out of `order_nums` fetched less than `max_age` seconds ago
+        """
+
+        oldest = time.time() - max_age
+        wanted = set(order_nums)
+        fresh = {}
+
+        with self.lock:
+            rows = self.connection.execute("SELECT order_num, record FROM orders WHERE site = ? AND fetched_at >= ?", (site, oldest))
+
+            for order_num, record in rows:
+                if order_num in wanted:
+                    fresh[order_num] = load_order(record)
+
+        return fresh
+
+    def put_many(self, site, orders):
+        """
+        Store (order number, order) pairs fetched just now
+        """
+
+        now = time.time()
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO orders (site, order_num, record, fetched_at) VALUES (?, ?, ?, ?)",
+                [(site, order_num, dump_order(order), now) for order_num, order in orders],
+            )
+
+    def prune(self, site, order_nums):
+        """
+        Remove orders of a site that are no longer pending (not in `order_nums`)
+        """
+
+        keep = set(order_nums)
+
+        with self.lock, self.connection:
+            stored = [row[0] for row in self.connection.execute("SELECT order_num FROM orders WHERE site = ?", (site,))]
+            self.connection.executemany(
+                "DELETE FROM orders WHERE site = ? AND order_num = ?",
+                [(site, order_num) for order_num in stored if order_num not in keep],
+            )
@@ -0,0 +1,130 @@
+"""
+Module for keeping the login cookies of every site on disk between runs
+"""
+
+import os
+import json
+import time
+import ctypes
+import threading
+
+CRYPTPROTECT_UI_FORBIDDEN = 0x1
+
+
+class DataBlob(ctypes.Structure):
+    """
+    The DATA_BLOB struct the Windows data protection api (DPAPI) takes and returns data in
+    """
+
+    _fields_ = [("cbData", ctypes.c_ulong), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+
+def dpapi(func, data):
+    """
+    Call `CryptProtectData` or `CryptUnprotectData` on some bytes
+    """
+
+    buffer = ctypes.create_string_buffer(data, len(data))
+    data_in = DataBlob(len(data), ctypes.cast(buffer, ctypes.POINTER(ctypes.c_char)))
+    data_out = DataBlob()
+
+    if not func(ctypes.byref(data_in), None, None, None, None, CRYPTPROTECT_UI_FORBIDDEN, ctypes.byref(data_out)):
+        raise ctypes.WinError()
+
+    try:
+        return ctypes.string_at(data_out.pbData, data_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(data_out.pbData)
+
+
+def protect(data):
+    """
+    Encrypt bytes so only the current Windows user can decrypt them (unchanged elsewhere, where the file is owner only instead)
+    """
+
+    if os.name != "nt":
+        return data
+
+    return dpapi(ctypes.windll.crypt32.CryptProtectData, data)
+
+
+def unprotect(data):
+    """
+    Decrypt bytes encrypted by `protect`
+    """
+
+    if os.name != "nt":
+        return data
+
+    return dpapi(ctypes.windll.crypt32.CryptUnprotectData, data)
+
+
+class CookieStore(object):
+    """
+    A json file of the cookies (as returned by `driver.get_cookies()`) of every site, readable only by its owner
+    (encrypted for the current user on Windows, where file permissions can't be set)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.sites = {}
+
+        try:
+            with open(path, "rb") as f:
+                self.sites = json.loads(unprotect(f.read()).decode("utf-8"))
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError): # a corrupt file (or one encrypted by another user) only costs a login
+            pass
+
+    def get(self, site):
+        """
+        Returns the stored cookies of a site that haven't expired (empty if there are none)
+        """
+
+        now = time.time()
+
+        with self.lock:
+            cookies = self.sites.get(site, [])
+
+        return [cookie for cookie in cookies if cookie.get("expiry", now + 1) > now]
+
+    def put(self, site, cookies):
+        """
+        Store the cookies of a site (replacing the old ones) and save the file
+        """
+
+        with self.lock:
+            self.sites[site] = cookies
+            self.save()
+
+    def save(self):
+        # written to a new file created with owner only permissions, then moved over the old one
+        temp_path = self.path + ".tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(fd, "wb") as f:
+            f.write(protect(json.dumps(self.sites).encode("utf-8")))
+
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, self.path)
+
+
+def cdp_cookies(cookies):
+    """
+    Convert selenium cookies to the format of the chrome devtools `Network.setCookies` command
+    (which sets cookies of any domain without first loading one of its pages)
+    """
+
+    converted = []
+
+    for cookie in cookies:
+        cdp_cookie = {key: cookie[key] for key in ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite") if key in cookie}
+
+        if "expiry" in cookie:
+            cdp_cookie["expires"] = cookie["expiry"]
+
+        converted.append(cdp_cookie)
+
+    return converted
@@ -0,0 +1,126 @@
+"""
+Long running scraper that keeps its browsers logged in and regenerates the report on a schedule or on request
+
+ex: SCRAPER_USERNAME=... SCRAPER_PASSWORD=... python daemon.py interval=30 port=8765
+    curl -X POST http://localhost:8765/refresh
+"""
+
+import os
+import json
+import threading
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from selenium.common.exceptions import WebDriverException
+import scraper
+import orders
+import sheets
+import cache
+import cookie_store
+
+DAEMON_OPTS = {
+    "config": "",     # json file with "username", "password" and "warehouses" (environment variables take precedence)
+    "interval": 60.0, # minutes between reports
+    "port": 0,        # local port accepting POST /refresh to regenerate the report now (0 to disable)
+}
+
+
+def load_config(cmd_options):
+    """
+    Read the credentials and warehouses from the config file and the environment
+    (SCRAPER_USERNAME, SCRAPER_PASSWORD and SCRAPER_WAREHOUSES, ex: 'NY,TX')
+    """
+
+    config = {}
+
+    if cmd_options["config"]:
+        with open(cmd_options["config"]) as f:
+            config = json.load(f)
+
+    username = os.environ.get("SCRAPER_USERNAME", config.get("username"))
+    password = os.environ.get("SCRAPER_PASSWORD", config.get("password"))
+    warehouses = config.get("warehouses", sheets.WAREHOUSE_IDS)
+
+    if "SCRAPER_WAREHOUSES" in os.environ:
+        warehouses = [wh.strip() for wh in os.environ["SCRAPER_WAREHOUSES"].split(",") if wh.strip()]
+
+    if not username or not password:
+        raise ValueError("No credentials: set SCRAPER_USERNAME and SCRAPER_PASSWORD or use a config file")
+
+    unknown = [wh for wh in warehouses if wh not in sheets.WAREHOUSE_IDS]
+
+    if unknown:
+        raise ValueError(f"Unknown warehouses {unknown} (expected some of {sheets.WAREHOUSE_IDS})")
+
+    return username, password, warehouses
+
+
+def start_trigger_server(port, trigger):
+    """
+    Serve POST /refresh on localhost, setting `trigger` for every request
+    """
+
+    class TriggerHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/refresh":
+                self.send_error(404)
+                return
+
+            trigger.set()
+            self.send_response(202)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), TriggerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def main():
+    cmd_options = scraper.parse_cmd_options(DAEMON_OPTS)
+    scraper.configure(cmd_options)
+    username, password, warehouses = load_config(cmd_options)
+
+    cookies = cookie_store.CookieStore(cmd_options["cookies"]) if cmd_options["cookies"] else None
+    sessions = [scraper.SiteSession(site, cmd_options, cookies) for site in cmd_options["sites"].split(",") if site]
+    order_cache = cache.OrderCache(cmd_options["cache"]) if cmd_options["cache"] else None
+    trigger = threading.Event()
+    server = start_trigger_server(cmd_options["port"], trigger) if cmd_options["port"] else None
+
+    try:
+        while True:
+            try:
+                # sessions stay logged in between runs, `scrape` only logs in again when a session has expired
+                path = scraper.run(sessions, cmd_options, username, password, warehouses, order_cache)
+                print(f"{datetime.now():%Y-%m-%d %H:%M} wrote {path}")
+            except (WebDriverException, orders.SessionError):
+                traceback.print_exc()
+
+                for session in sessions:
+                    try:
+                        session.driver.current_url
+                    except WebDriverException: # the browser died, start a new one for the next run
+                        session.restart()
+            except Exception:
+                traceback.print_exc()
+
+            trigger.wait(cmd_options["interval"] * 60)
+            trigger.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+
+        for session in sessions:
+            session.close()
+
+        if order_cache is not None:
+            order_cache.close()
+
+
+if __name__ == "__main__":
+    main()
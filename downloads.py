@@ -0,0 +1,104 @@
+"""
+Module for waiting on browser downloads
+"""
+
+import os
+import time
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError: # fall back to polling
+    Observer = None
+    FileSystemEventHandler = object
+
+TEMP_SUFFIXES = (".crdownload", ".tmp", ".part") # files a browser writes to while a download is in progress
+MIN_POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 1.0
+
+
+class DownloadTimeoutError(TimeoutError):
+    """
+    Raised when a download does not finish in time
+    """
+
+
+class ChangeHandler(FileSystemEventHandler):
+    """
+    Wakes up a waiting thread whenever something in the watched directory changes
+    """
+
+    def __init__(self, event):
+        super().__init__()
+        self.event = event
+
+    def on_any_event(self, event):
+        self.event.set()
+
+
+def completed_download(path, suffix):
+    """
+    Return the path of the finished download in `path` (or None if it is still in progress)
+    """
+
+    files = [f for f in os.listdir(path) if not f.startswith(".")]
+    finished = [f for f in files if not f.endswith(TEMP_SUFFIXES)]
+
+    if len(finished) > 1:
+        raise ValueError(f"Expected a single download in {path}, found {finished}")
+
+    if len(finished) < len(files) or not finished or not finished[0].endswith(suffix):
+        return None
+
+    download = os.path.join(path, finished[0])
+
+    try:
+        if os.path.getsize(download) == 0:
+            return None
+    except FileNotFoundError: # renamed or removed between listing and checking
+        return None
+
+    return download
+
+
+def wait_for_download(path, suffix=".xlsx", timeout=60):
+    """
+    Wait for a single file ending in `suffix` to finish downloading into `path` and return its path
+    Uses filesystem notifications when watchdog is installed and polls with a backoff otherwise
+    """
+
+    deadline = time.monotonic() + timeout
+    changed = threading.Event()
+    observer = None
+
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(ChangeHandler(changed), path, recursive=False)
+        observer.start()
+
+    try:
+        interval = MIN_POLL_INTERVAL
+
+        while True:
+            download = completed_download(path, suffix)
+
+            if download is not None:
+                return download
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                raise DownloadTimeoutError(f"No {suffix} download finished in {path} after {timeout}s (found {os.listdir(path)})")
+
+            if observer is not None:
+                # the timeout guards against missed notifications (ex: network drives)
+                changed.wait(min(remaining, MAX_POLL_INTERVAL))
+                changed.clear()
+            else:
+                time.sleep(min(remaining, interval))
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
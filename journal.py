@@ -0,0 +1,90 @@
+"""
+Module for journaling a scrape run so it can be resumed after a crash
+"""
+
+import os
+import json
+import threading
+import cache
+
+
+class Journal(object):
+    """
+    An append only json lines file of every order scraped (and every order that failed) during a run
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.orders = {}   # (site, order number) -> order
+        self.failures = {} # (site, order number) -> error message
+
+        if resume and os.path.exists(path):
+            self.load()
+
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def load(self):
+        """
+        Read the entries of a previous run (a partly written last line from a crash is ignored)
+        """
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                key = (entry["site"], entry["order_num"])
+
+                if "order" in entry:
+                    self.orders[key] = cache.decode_order(entry["order"])
+                    self.failures.pop(key, None)
+                else:
+                    self.failures[key] = entry["error"]
+
+    def write(self, entry):
+        with self.lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+
+    def record(self, site, order_num, order):
+        """
+        Journal a scraped order
+        """
+
+        self.write({"site": site, "order_num": order_num, "order": cache.encode_order(order)})
+
+        with self.lock:
+            self.orders[(site, order_num)] = order
+            self.failures.pop((site, order_num), None)
+
+    def record_failure(self, site, order_num, error):
+        """
+        Journal an order that could not be scraped
+        """
+
+        message = f"{type(error).__name__}: {error}"
+        self.write({"site": site, "order_num": order_num, "error": message})
+
+        with self.lock:
+            self.failures[(site, order_num)] = message
+
+    def done(self, site):
+        """
+        Returns the orders of a site already scraped (by order number)
+        """
+
+        with self.lock:
+            return {order_num: order for (order_site, order_num), order in self.orders.items() if order_site == site}
+
+    def close(self):
+        with self.lock:
+            self.file.close()
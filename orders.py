@@ -0,0 +1,370 @@
+"""
+Module for fetching and parsing order manage pages without a browser
+"""
+
+import time
+import itertools
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+import sheets
+import timing
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# errors that only affect one order (retried, then reported), LookupError covers pages missing a column or detail after a layout change
+FETCH_ERRORS = (ValueError, LookupError, requests.RequestException)
+
+
+class SessionError(Exception):
+    """
+    The session can't fetch any more orders (logged out or the browser is gone), so the whole site fails instead of one order
+    """
+
+
+IMPLICIT_CLOSE = {
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "tr": {"tr", "td", "th"},
+    "tbody": {"tbody", "thead", "tfoot", "tr", "td", "th"},
+    "thead": {"tbody", "thead", "tfoot", "tr", "td", "th"},
+    "tfoot": {"tbody", "thead", "tfoot", "tr", "td", "th"},
+    "li": {"li"},
+    "option": {"option"},
+    "p": {"p"},
+}
+
+
+class Node(object):
+    """
+    An element in a parsed html page
+    """
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = dict(attrs)
+        self.parent = parent
+        self.children = [] # child nodes and text
+
+    def text_content(self):
+        """
+        All text inside this node (same as the DOM's textContent)
+        """
+
+        return "".join(child if isinstance(child, str) else child.text_content() for child in self.children)
+
+    def inner_text(self):
+        """
+        Approximation of the DOM's innerText (whitespace collapsed and stripped)
+        """
+
+        return " ".join(self.text_content().split())
+
+    def next_sibling(self):
+        """
+        The node or text directly after this one
+        """
+
+        siblings = self.parent.children
+        i = next(i for i, child in enumerate(siblings) if child is self)
+
+        return siblings[i + 1] if i + 1 < len(siblings) else None
+
+    def find_all(self, tag):
+        """
+        All descendants with a given tag (in document order)
+        """
+
+        found = []
+
+        for child in self.children:
+            if isinstance(child, Node):
+                if child.tag == tag:
+                    found.append(child)
+                found.extend(child.find_all(tag))
+
+        return found
+
+
+class PageParser(HTMLParser):
+    """
+    Builds a tree of `Node`s from an html page
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", [], None)
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        closes = IMPLICIT_CLOSE.get(tag, ())
+
+        while self.current.tag in closes:
+            self.current = self.current.parent
+
+        # like browsers, rows directly in a table go in a tbody (the scraper picks tables by counting tbodys)
+        if tag == "tr" and self.current.tag == "table":
+            tbody = Node("tbody", [], self.current)
+            self.current.children.append(tbody)
+            self.current = tbody
+
+        node = Node(tag, attrs, self.current)
+        self.current.children.append(node)
+
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Node(tag, attrs, self.current))
+
+    def handle_endtag(self, tag):
+        node = self.current
+
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_page(html):
+    """
+    Parse an html page into a tree of `Node`s
+    """
+
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+
+    return parser.root
+
+
+def strip_warehouse(text):
+    """
+    Keep only the letters of a warehouse name
+    """
+
+    return "".join(c for c in text if c.isalpha())
+
+
+def parse_carrier(text):
+    """
+    Extract the carrier from a tracking cell ("... [Carrier] ...")
+    """
+
+    try:
+        return text[text.index("[") + 1:text.index("]")]
+    except ValueError:
+        return "UNKWN"
+
+
+def extract_fields(html):
+    """
+    Extract the raw text fields the scraper needs from an order manage page
+    """
+
+    root = parse_page(html)
+    fields = {"order_date": None, "po": None}
+
+    for elem in root.find_all("strong"):
+        inner = elem.inner_text()
+
+        if fields["order_date"] is None and inner == "Order Date":
+            fields["order_date"] = text_of(elem.next_sibling())
+        elif fields["po"] is None and inner == "PO #":
+            fields["po"] = text_of(elem.next_sibling())
+
+    theads = root.find_all("thead")
+    tbodys = root.find_all("tbody")
+
+    if len(theads) < 4 or len(tbodys) < 4:
+        raise ValueError("Order page is missing item tables")
+
+    fields["green_bolds"] = [elem.inner_text() for elem in root.find_all("b") if "green" in elem.attrs.get("style", "")]
+    fields["details"] = [td.inner_text() for td in tbodys[2].find_all("td")]
+    fields["headings"] = heading_texts(theads[3])
+    fields["headings2"] = heading_texts(theads[2])
+    fields["rows"] = []
+
+    for trow in tbodys[3].find_all("tr"):
+        item_data = trow.find_all("td")
+
+        if not item_data:
+            break
+
+        fields["rows"].append([td.inner_text() for td in item_data])
+
+    return fields
+
+
+def text_of(node):
+    """
+    The textContent of a node or text
+    """
+
+    if node is None or isinstance(node, str):
+        return node
+
+    return node.text_content()
+
+
+def heading_texts(thead):
+    """
+    The texts of the headings in the first row of a table head
+    """
+
+    trows = thead.find_all("tr")
+
+    return [th.inner_text() for th in trows[0].find_all("th")] if trows else []
+
+
+def build_order(fields):
+    """
+    Build an order (order time, po, carrier, status, warehouse, items) from its raw text fields
+    """
+
+    if fields["order_date"] is None or fields["po"] is None:
+        raise ValueError
+
+    order_time = datetime.strptime(fields["order_date"], " - %m/%d/%Y")
+    po = fields["po"][3:]
+    status = "Not Shipped"
+
+    for text in fields["green_bolds"]:
+        warehouse = strip_warehouse(text.strip())
+
+        if any(wh in warehouse for wh in sheets.WAREHOUSE_IDS):
+            break
+    else:
+        warehouse = strip_warehouse(fields["details"][1])
+
+        if not any(wh in warehouse for wh in sheets.WAREHOUSE_IDS):
+            raise ValueError("Could not find warehouse")
+
+    num_index = fields["headings"].index("Item Name")
+    qty_index = fields["headings"].index("Quanity")
+    carrier_i = fields["headings2"].index("Tracking #")
+    carrier = parse_carrier(fields["details"][carrier_i])
+    items = [(row[num_index], row[qty_index]) for row in fields["rows"]]
+
+    if not items:
+        raise ValueError("Order page has no items")
+
+    return (
+        order_time,
+        po,
+        carrier,
+        status,
+        warehouse,
+        items,
+    )
+
+
+def order_rows(orders, as_of=None):
+    """
+    Convert orders to the data tuples `sheets.parse_data` expects (computing all their ship statuses at once)
+    """
+
+    ship_statuses = sheets.get_ship_statuses([order[0] for order in orders], [order[3] for order in orders], as_of)
+
+    return [
+        (po, carrier, status, warehouse, ship_status, items)
+        for (_, po, carrier, status, warehouse, items), ship_status in zip(orders, ship_statuses)
+    ]
+
+
+def create_session(cookies, user_agent=None, pool_size=1):
+    """
+    Create a pooled http session authenticated with cookies taken from a logged in driver (`driver.get_cookies()`)
+    """
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if user_agent is not None:
+        session.headers["User-Agent"] = user_agent
+
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+
+    return session
+
+
+def fetch_order(session, site_url, order_num, timeout=10, timer=timing.NO_TIMER):
+    """
+    Fetch and parse a single order manage page
+    """
+
+    with timer.span("attempt", site=site_url, order=order_num):
+        with timer.span("request", site=site_url, order=order_num) as span:
+            response = session.get(f"{site_url}/orders/{order_num}/manage", timeout=timeout)
+            response.raise_for_status()
+            span["bytes"] = len(response.content)
+
+        if 'id="btnLogin"' in response.text:
+            raise SessionError(f"Session is not logged in (order {order_num})")
+
+        with timer.span("parse", site=site_url, order=order_num):
+            return build_order(extract_fields(response.text))
+
+
+def with_retries(func, retries=0, backoff=1.0, errors=FETCH_ERRORS, fatal=()):
+    """
+    Call `func`, retrying up to `retries` times (waiting `backoff` seconds, doubling every retry) when it raises one of `errors`
+    (except the `fatal` ones, raised right away)
+    """
+
+    for attempt in itertools.count():
+        try:
+            return func()
+        except fatal:
+            raise
+        except errors:
+            if attempt >= retries:
+                raise
+
+            time.sleep(backoff * 2 ** attempt)
+
+
+def fetch_orders(session, site_url, order_nums, workers=1, on_order=None, on_failure=None, retries=0, backoff=1.0, timer=timing.NO_TIMER):
+    """
+    Fetch and parse a list of orders over http, returning the results in the same order as `order_nums`
+    `on_order(index, order)` is called as each order completes (in order)
+    With `on_failure`, an order that still fails after `retries` retries is reported through `on_failure(index, error)`
+    (and left as None in the results) instead of stopping the whole fetch
+    """
+
+    def fetch(order_num):
+        try:
+            # one "order" span per order however many attempts it takes (so the summary's throughput counts orders)
+            with timer.span("order", site=site_url, order=order_num):
+                return with_retries(lambda: fetch_order(session, site_url, order_num, timer=timer), retries, backoff), None
+        except FETCH_ERRORS as e:
+            if on_failure is None:
+                raise
+
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = []
+
+        try:
+            for i, (order, error) in enumerate(executor.map(fetch, order_nums)):
+                results.append(order)
+
+                if error is not None:
+                    on_failure(i, error)
+                elif on_order is not None:
+                    on_order(i, order)
+        except BaseException:
+            # don't keep fetching the rest of the orders (ex: after a `SessionError`)
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return results
@@ -0,0 +1,60 @@
+"""
+Module for recording the pages the scraper visits, so they can be replayed offline (see replay.py)
+
+Pages are saved by site and path, ex:
+    recordings/homebeyond/reports/login.html
+    recordings/homebeyond/reports/index.html
+    recordings/homebeyond/reports/pending.xlsx
+    recordings/homebeyond/orders/123/manage.html
+"""
+
+import os
+import shutil
+
+
+class Recorder(object):
+    """
+    Saves pages under a directory, by site (the last part of the site url) and path
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def page_path(self, site_url, page):
+        return os.path.join(self.path, site_url.rstrip("/").rsplit("/", 1)[-1], *page.split("/"))
+
+    def save(self, site_url, page, content):
+        """
+        Save the content (str or bytes) of a page
+        """
+
+        path = self.page_path(site_url, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def save_file(self, site_url, page, source_path):
+        """
+        Save a downloaded file as a page
+        """
+
+        path = self.page_path(site_url, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source_path, path)
+
+    def response_hook(self, site_url):
+        """
+        Returns a `requests` response hook saving every order page of the site that loads
+        """
+
+        def hook(response, *args, **kwargs):
+            page = response.url[len(site_url) + 1:].split("?")[0]
+
+            if response.ok and response.url.startswith(site_url + "/orders/") and 'id="btnLogin"' not in response.text:
+                self.save(site_url, page + ".html", response.content)
+
+        return hook
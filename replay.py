@@ -0,0 +1,262 @@
+"""
+Offline stand-in for the order websites, serving pages recorded with the scraper's 'record' option
+
+ex: python scraper.py record=recordings             (record the live sites once)
+    python replay.py recordings=recordings latency=0.2 engine=http workers=4
+    python replay.py mode=check                     (parse every recorded page, reporting layout errors)
+    python replay.py mode=profiles                  (check chrome reads every recorded order the same with and without 'light')
+    python replay.py mode=serve port=8766           (then: python scraper.py base_url=http://127.0.0.1:8766)
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import scraper
+import sheets
+import orders
+
+REPLAY_OPTS = {
+    "recordings": "recordings", # directory the pages were recorded in
+    "mode": "bench",            # 'bench' (scrape the stand-in and measure orders/s), 'serve', 'check' (parse every recorded page)
+                                # or 'profiles' (scrape every recorded order with both page load profiles and compare)
+    "port": 8766,               # local port of the stand-in server
+    "latency": 0.05,            # seconds added to every response
+    "jitter": 0.0,              # up to this many random seconds added on top of `latency`
+    "bench_dir": "bench_replay", # where 'bench' writes its reports (kept apart from the real daily reports)
+}
+SESSION_COOKIE = "replay_session"
+
+# the stand-in's own login and reports pages (same element ids as the real ones)
+LOGIN_PAGE = f"""<html><body>
+<input name="LoginId"><input name="Password" type="password">
+<button id="btnLogin" onclick="document.cookie = '{SESSION_COOKIE}=1; path=/'; location.reload()">Login</button>
+</body></html>"""
+REPORTS_PAGE = """<html><body>
+<button id="btnPendingShipment" onclick="location.href = 'reports/pending.xlsx'">Pending Shipment</button>
+</body></html>"""
+
+
+def start_replay_server(recordings, port, latency=0.0, jitter=0.0):
+    """
+    Serve the recorded pages on localhost (behind the stand-in's login), delaying every response by `latency` (+ up to `jitter`) seconds
+    """
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency + random.uniform(0, jitter))
+
+            site, _, page = self.path.split("?")[0].strip("/").partition("/")
+            logged_in = f"{SESSION_COOKIE}=1" in self.headers.get("Cookie", "")
+
+            if not logged_in:
+                self.send_page(LOGIN_PAGE.encode("utf-8"), "text/html")
+                return
+
+            if page == "reports":
+                self.send_page(REPORTS_PAGE.encode("utf-8"), "text/html")
+                return
+
+            path = os.path.join(recordings, site, *page.split("/"))
+
+            if page.endswith(".xlsx"):
+                disposition = f"attachment; filename={os.path.basename(path)}"
+                self.send_file(path, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", disposition)
+            else:
+                self.send_file(path + ".html", "text/html")
+
+        def send_file(self, path, content_type, disposition=None):
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+            except OSError:
+                self.send_error(404)
+                return
+
+            self.send_page(content, content_type, disposition)
+
+        def send_page(self, content, content_type, disposition=None):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+
+            if disposition is not None:
+                self.send_header("Content-Disposition", disposition)
+
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), ReplayHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def check_recordings(recordings):
+    """
+    Parse every recorded page like the scraper does, returning a description of every page that fails (ex: after a layout change)
+    """
+
+    errors = []
+
+    for site in sorted(os.listdir(recordings)):
+        site_path = os.path.join(recordings, site)
+        pages = {
+            os.path.join("reports", "login.html"): ['id="btnLogin"', 'name="LoginId"', 'name="Password"'],
+            os.path.join("reports", "index.html"): ['id="btnPendingShipment"'],
+        }
+
+        for page, markers in pages.items():
+            try:
+                with open(os.path.join(site_path, page), encoding="utf-8") as f:
+                    html = f.read()
+            except FileNotFoundError:
+                continue
+
+            for marker in markers:
+                if marker not in html:
+                    errors.append(f"{site}/{page}: missing {marker}")
+
+        if os.path.exists(os.path.join(site_path, "reports", "pending.xlsx")):
+            try:
+                sheets.extract_order_nums(os.path.join(site_path, "reports", "pending.xlsx"))
+            except Exception as e:
+                errors.append(f"{site}/reports/pending.xlsx: {type(e).__name__}: {e}")
+
+        orders_path = os.path.join(site_path, "orders")
+
+        for order_num in sorted(os.listdir(orders_path)) if os.path.isdir(orders_path) else []:
+            with open(os.path.join(orders_path, order_num, "manage.html"), encoding="utf-8") as f:
+                html = f.read()
+
+            try:
+                orders.build_order(orders.extract_fields(html))
+            except orders.FETCH_ERRORS as e:
+                errors.append(f"{site}/orders/{order_num}/manage.html: {type(e).__name__}: {e}")
+
+    return errors
+
+
+def check_profiles(cmd_options):
+    """
+    Scrape every recorded order from the stand-in in chrome with the normal and the 'light' page load profile,
+    returning a description of every order either profile reads differently from the http parser (which ignores styles)
+    """
+
+    base_url = f"http://127.0.0.1:{cmd_options['port']}"
+    errors = []
+
+    def read(func):
+        try:
+            return func()
+        except scraper.SCRAPE_ERRORS as e:
+            return f"{type(e).__name__}: {e}"
+
+    for site in cmd_options["sites"].split(","):
+        orders_path = os.path.join(cmd_options["recordings"], site, "orders")
+        order_nums = sorted(os.listdir(orders_path)) if os.path.isdir(orders_path) else []
+        results = {}
+
+        for order_num in order_nums:
+            with open(os.path.join(orders_path, order_num, "manage.html"), encoding="utf-8") as f:
+                html = f.read()
+
+            results[order_num] = {"http": read(lambda: orders.build_order(orders.extract_fields(html)))}
+
+        for profile, light in (("normal", False), ("light", True)):
+            session = scraper.SiteSession(site, dict(cmd_options, light=light))
+
+            try:
+                scraper.ensure_login(session.driver, session.wait, f"{base_url}/{site}", "replay", "replay")
+
+                for order_num in order_nums:
+                    results[order_num][profile] = read(lambda: scraper.scrape_order(session.driver, session.wait, f"{base_url}/{site}", order_num))
+            finally:
+                session.close()
+
+        for order_num, result in results.items():
+            for profile in ("normal", "light"):
+                if result[profile] != result["http"]:
+                    errors.append(f"{site}/orders/{order_num}: {profile} profile read {result[profile]!r}, expected {result['http']!r}")
+
+    return errors
+
+
+def benchmark(cmd_options):
+    """
+    Scrape the stand-in end to end with the configured engine and workers, returning the orders scraped per second
+    """
+
+    sessions = [scraper.SiteSession(site, cmd_options) for site in cmd_options["sites"].split(",") if site]
+    total = sum(len(os.listdir(os.path.join(cmd_options["recordings"], site, "orders"))) for site in cmd_options["sites"].split(",") if site)
+
+    try:
+        start = time.perf_counter()
+        scraper.run(sessions, cmd_options, "replay", "replay", sheets.WAREHOUSE_IDS)
+        seconds = time.perf_counter() - start
+    finally:
+        for session in sessions:
+            session.close()
+
+    print(f"{total} orders in {seconds:.1f} s: {total / seconds:.2f} orders/s (engine={cmd_options['engine']}, workers={cmd_options['workers']})")
+
+    return total / seconds
+
+
+def main():
+    cmd_options = scraper.parse_cmd_options(REPLAY_OPTS)
+
+    if cmd_options["mode"] not in ("bench", "serve", "check", "profiles"):
+        raise ValueError(f"Unknown mode {cmd_options['mode']!r} (expected 'bench', 'serve', 'check' or 'profiles')")
+
+    if cmd_options["mode"] == "check":
+        errors = check_recordings(cmd_options["recordings"])
+
+        for error in errors:
+            print(error)
+
+        sys.exit(1 if errors else 0)
+
+    server = start_replay_server(cmd_options["recordings"], cmd_options["port"], cmd_options["latency"], cmd_options["jitter"])
+
+    try:
+        if cmd_options["mode"] == "serve":
+            print(f"Serving {cmd_options['recordings']} on http://127.0.0.1:{cmd_options['port']}")
+            threading.Event().wait()
+
+        if cmd_options["mode"] == "profiles":
+            errors = check_profiles(cmd_options)
+
+            for error in errors:
+                print(error)
+
+            sys.exit(1 if errors else 0)
+
+        # recordings are replayed as is: nothing is journaled, cached or recorded again, and every output goes to the bench directory
+        os.makedirs(cmd_options["bench_dir"], exist_ok=True)
+        cmd_options = dict(
+            cmd_options,
+            base_url=f"http://127.0.0.1:{cmd_options['port']}",
+            timing=True,
+            journal="",
+            cache="",
+            record="",
+            cookies="",
+            output_dir=cmd_options["bench_dir"],
+            state_file="scraped_state.json",
+        )
+        scraper.configure(cmd_options)
+        benchmark(cmd_options)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,130 @@
 import os
 import sys
+import time
+import queue
+import threading
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import WebDriverException, InvalidSessionIdException, NoSuchWindowException
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions
-from tempfile import gettempdir
-from pathlib import Path
-from random import random
-from datetime import datetime, date
+from tempfile import mkdtemp
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 import sheets
+import orders
+import downloads
+import cache
+import journal
+import snapshot
+import cookie_store
+import recording
+import timing
+
+RECORDER = None # `recording.Recorder` saving every page visited (see the 'record' option)
+SCRAPE_ERRORS = orders.FETCH_ERRORS + (WebDriverException,) # errors that only affect one order (retried, then reported)
+BROWSER_GONE_ERRORS = (InvalidSessionIdException, NoSuchWindowException) # the browser died or was closed, every other order would fail too
+
+# extracts everything `orders.build_order` needs from an order page in a single call
+# (returns null until the item tables have loaded)
+# texts are read like `orders.Node.inner_text` (textContent, whitespace collapsed), which unlike innerText doesn't depend on
+# stylesheets (blocked by the 'light' profile), so every engine and profile reads the same text
+EXTRACT_ORDER_JS = """
+var tbodys = document.querySelectorAll("tbody");
+var theads = document.querySelectorAll("thead");
+
+if (tbodys.length < 4 || theads.length < 4) {
+    return null;
+}
+
+var text = function (elem) { return elem.textContent.replace(/\s+/g, " ").trim(); };
+var headings = function (thead) {
+    var row = thead.querySelector("tr");
+    return row ? Array.from(row.querySelectorAll("th")).map(text) : [];
+};
+var fields = { order_date: null, po: null, rows: [] };
+var strongs = document.querySelectorAll("strong");
+
+for (var i = 0; i < strongs.length; i++) {
+    var inner = text(strongs[i]);
+    var sibling = strongs[i].nextSibling;
+
+    if (fields.order_date === null && inner === "Order Date") {
+        fields.order_date = sibling ? sibling.textContent : null;
+    } else if (fields.po === null && inner === "PO #") {
+        fields.po = sibling ? sibling.textContent : null;
+    }
+}
+
+fields.green_bolds = Array.from(document.querySelectorAll("b"))
+    .filter(function (b) { return (b.getAttribute("style") || "").indexOf("green") !== -1; })
+    .map(text);
+fields.details = Array.from(tbodys[2].querySelectorAll("td")).map(text);
+fields.headings = headings(theads[3]);
+fields.headings2 = headings(theads[2]);
+
+var trows = tbodys[3].querySelectorAll("tr");
 
+for (var i = 0; i < trows.length; i++) {
+    var tds = trows[i].querySelectorAll("td");
+
+    if (!tds.length) {
+        break;
+    }
 
-def query_sheet(path):
+    fields.rows.push(Array.from(tds).map(text));
+}
+
+return fields;
+"""
+
+# bytes transferred and load time of the current page (from the resource timing api)
+PAGE_STATS_JS = """
+var navigation = performance.getEntriesByType("navigation")[0];
+var resources = performance.getEntriesByType("resource");
+var bytes = navigation ? navigation.transferSize : 0;
+
+for (var i = 0; i < resources.length; i++) {
+    bytes += resources[i].transferSize;
+}
+
+return {
+    bytes: bytes,
+    resources: resources.length,
+    load_ms: navigation ? Math.max(navigation.responseEnd, navigation.domContentLoadedEventEnd) : 0,
+};
+"""
+
+# resources the scraper never needs (blocked in the 'light' page load profile)
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.css",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*", "*hotjar.com*",
+]
+
+# browser features the scraper never needs (turned off in the 'light' page load profile)
+LIGHT_ARGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-remote-fonts",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+
+def query_sheet(path, timeout=60):
     """
     Wait for a sheet to be downloaded
     """
 
-    while True:
-        files = os.listdir(path)
-
-        if len(files) == 1 and files[0].endswith(".xlsx"):
-            return os.path.join(path, files[0])
-        elif len(files) > 1:
-            raise ValueError
+    return downloads.wait_for_download(path, ".xlsx", timeout)
 
 
 def clear_files(path):
@@ -36,179 +137,324 @@ def clear_files(path):
         os.remove(os.path.join(path, f))
 
 
-def get_warehouse(driver):
+def ensure_login(driver, wait, site_url, username, password):
     """
-    Determine the warehouse
+    Open the reports page of a website, logging in only if the session isn't already logged in
+    Returns once the logged in reports page has loaded
     """
 
-    wh_strip = lambda s: "".join(c for c in s if c.isalpha())
-    for elem in driver.find_elements(By.CSS_SELECTOR, "b"):
-        if "green" in elem.get_attribute("style"):
-            warehouse = wh_strip(elem.get_attribute("innerText").strip())
-            if any(wh in warehouse for wh in sheets.WAREHOUSE_IDS):
-                return warehouse
-    warehouse = wh_strip(driver.find_elements(By.CSS_SELECTOR, "tbody")[2].find_elements(By.CSS_SELECTOR, "td")[1].get_attribute("innerText"))
-    if any(wh in warehouse for wh in sheets.WAREHOUSE_IDS):
-        return warehouse
-    raise ValueError("Could not find warehouse")
+    # marks the current page so its buttons aren't mistaken for the new page's (the page load strategy is "none")
+    driver.execute_script("window.staleScraperPage = true")
+    driver.get(f"{site_url}/reports")
 
+    logged_out = wait.until(lambda driver: driver.execute_script("""
+        if (window.staleScraperPage) {
+            return null;
+        }
+        if (document.getElementById("btnLogin")) {
+            return "logged out";
+        }
+        return document.getElementById("btnPendingShipment") ? "logged in" : null;
+    """)) == "logged out"
 
-def get_carrier(driver, carrier_i):
-    """
-    Determine the carrier
-    """
+    if RECORDER is not None:
+        RECORDER.save(site_url, "reports/login.html" if logged_out else "reports/index.html", driver.page_source)
 
-    carrier = driver.find_elements(By.CSS_SELECTOR, "tbody")[2].find_elements(By.CSS_SELECTOR, "td")[carrier_i].get_attribute("innerText")
+    if logged_out:
+        submit_login(driver, username, password)
 
-    try:
-        return carrier[carrier.index("[") + 1:carrier.index("]")]
-    except ValueError:
-        return "UNKWN"
+        # callers navigate away right after logging in, which would cancel a login still being submitted
+        wait.until(expected_conditions.presence_of_element_located((By.ID, "btnPendingShipment")))
 
 
-def scrape(driver, data, wait, site, cmd_options, temp_dir, username, password):
+def set_cookies(driver, cookies):
     """
-    Scrape one website and add all the data to `data`
+    Load cookies (ex: of a logged in session) into a driver, for any of their domains
     """
 
-    driver.get(f"https://www2.order-fulfillment.bz/{site}/reports")
+    if cookies:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookie_store.cdp_cookies(cookies)})
+
+
+def submit_login(driver, username, password):
+    """
+    Fill in and submit the login form on the current page
+    """
 
-    wait.until(expected_conditions.presence_of_element_located((By.ID, "btnLogin")))
     driver.find_element(By.NAME, "LoginId").send_keys(username)
     driver.find_element(By.NAME, "Password").send_keys(password)
     driver.find_element(By.ID, "btnLogin").click()
 
-    wait.until(expected_conditions.presence_of_element_located((By.CSS_SELECTOR, "#btnPendingShipment"))).click()
-    clear_files(temp_dir)
-    sheet_path = query_sheet(temp_dir)
-    order_nums = sheets.extract_order_nums(sheet_path)
 
-    total = len(order_nums)
+def scrape_order(driver, wait, site_url, order_num, timer=timing.NO_TIMER):
+    """
+    Scrape a single order page and return its data
+    """
 
-    for i, order_num in enumerate(order_nums):
-        if cmd_options["show_progress"]:
-            print(f"{i + 1}/{total}")
+    order_url = f"{site_url}/orders/{order_num}/manage"
 
-        url = f"https://www2.order-fulfillment.bz/{site}/orders"
-        order_url = f"{url}/{order_num}/manage"
+    with timer.span("attempt", site=site_url, order=order_num):
+        with timer.span("get", site=site_url, order=order_num):
+            driver.get(order_url)
 
-        driver.get(order_url)
-        wait.until(lambda driver: driver.current_url == order_url)
+        with timer.span("url_wait", site=site_url, order=order_num):
+            wait.until(lambda driver: driver.current_url == order_url)
 
-        tbodys = driver.find_elements(By.CSS_SELECTOR, "tbody")
-        while len(tbodys) < 4:
-            tbodys = driver.find_elements(By.CSS_SELECTOR, "tbody")
-        tbody = tbodys[3]
+        with timer.span("extract", site=site_url, order=order_num):
+            fields = wait.until(lambda driver: driver.execute_script(EXTRACT_ORDER_JS))
 
-        items = []
+        if RECORDER is not None:
+            RECORDER.save(site_url, f"orders/{order_num}/manage.html", driver.page_source)
 
-        order_time = None
-        po_num = None
+        if timer.enabled:
+            stats = driver.execute_script(PAGE_STATS_JS)
+            timer.record("page_load", time.time(), stats["load_ms"] / 1000, {"site": site_url, "order": order_num, "bytes": stats["bytes"], "resources": stats["resources"]})
 
-        for elem in driver.find_elements(By.CSS_SELECTOR, "strong"):
-            inner = elem.get_attribute("innerText")
+        with timer.span("build", site=site_url, order=order_num):
+            return orders.build_order(fields)
 
-            if order_time is None and inner == "Order Date":
-                order_time = driver.execute_script("return arguments[0].nextSibling", elem)
-                order_time = datetime.strptime(order_time["textContent"], " - %m/%d/%Y")
-            elif po_num is None and inner == "PO #":
-                po_num = driver.execute_script("return arguments[0].nextSibling", elem)
 
-            if po_num is not None and order_time is not None:
-                break
-        else:
-            raise ValueError
+def scrape_order_retrying(driver, wait, site_url, order_num, cmd_options, timer=timing.NO_TIMER):
+    """
+    Scrape an order, retrying (with exponential backoff) when the page fails to load or parse
+    Raises `orders.SessionError` if the browser is gone
+    """
 
-        warehouse = get_warehouse(driver)
-        po = po_num["textContent"][3:]
-        status = "Not Shipped"
-        ship_status = sheets.get_ship_status(order_time, status)
+    try:
+        # retries are "attempt" spans inside the order's span, like `orders.fetch_orders`
+        with timer.span("order", site=site_url, order=order_num):
+            return orders.with_retries(
+                lambda: scrape_order(driver, wait, site_url, order_num, timer),
+                cmd_options["retries"],
+                cmd_options["backoff"],
+                SCRAPE_ERRORS,
+                BROWSER_GONE_ERRORS,
+            )
+    except BROWSER_GONE_ERRORS as e:
+        raise orders.SessionError(f"Browser is gone (order {order_num}): {e}") from e
+
+
+def scrape_orders(drivers, waits, site_url, order_nums, cmd_options, on_order, on_failure, timer=timing.NO_TIMER):
+    """
+    Scrape a list of orders with a pool of logged in drivers (one worker thread per driver),
+    calling `on_order(index, order)` or `on_failure(index, error)` (one call at a time) as each order is done
+    """
 
-        headings = driver.find_elements(By.CSS_SELECTOR, "thead")[3].find_element(By.CSS_SELECTOR, "tr").find_elements(By.CSS_SELECTOR, "th")
-        headings2 = driver.find_elements(By.CSS_SELECTOR, "thead")[2].find_element(By.CSS_SELECTOR, "tr").find_elements(By.CSS_SELECTOR, "th")
+    order_queue = queue.Queue()
+    order_lock = threading.Lock()
+    errors = []
 
-        num_index = None
-        qty_index = None
-        carrier_i = None
+    for i, order_num in enumerate(order_nums):
+        order_queue.put((i, order_num))
 
-        for i, heading in enumerate(headings):
-            text = heading.get_attribute("innerText")
+    def work(driver, wait):
+        while not errors:
+            try:
+                i, order_num = order_queue.get_nowait()
+            except queue.Empty:
+                return
 
-            if text == "Item Name":
-                num_index = i
-            elif text == "Quanity":
-                qty_index = i
+            try:
+                try:
+                    order = scrape_order_retrying(driver, wait, site_url, order_num, cmd_options, timer)
+                except SCRAPE_ERRORS as e:
+                    with order_lock:
+                        on_failure(i, e)
 
-            if num_index is not None and qty_index is not None:
-                break
-        else:
-            raise ValueError
+                    continue
 
-        for i, heading in enumerate(headings2):
-            text = heading.get_attribute("innerText")
+                with order_lock:
+                    on_order(i, order)
+            except Exception as e:
+                errors.append(e)
+                return
 
-            if text == "Tracking #":
-                carrier_i = i
+    threads = [threading.Thread(target=work, args=(driver, wait)) for driver, wait in zip(drivers, waits)]
 
-            if carrier_i is not None:
-                break
-        else:
-            raise ValueError
+    for thread in threads:
+        thread.start()
 
-        carrier = get_carrier(driver, carrier_i)
+    for thread in threads:
+        thread.join()
 
-        for trow in tbody.find_elements(By.CSS_SELECTOR, "tr"):
-            item_data = trow.find_elements(By.CSS_SELECTOR, "td")
+    if errors:
+        raise errors[0]
 
-            if not item_data:
-                break
 
-            num_td = item_data[num_index]
-            qty_td = item_data[qty_index]
-            num = num_td.get_attribute("innerText")
-            qty = qty_td.get_attribute("innerText")
+def fetch_orders(driver, wait, site_url, order_nums, cmd_options, temp_dir, username, password, on_order, on_failure, timer=timing.NO_TIMER):
+    """
+    Fetch a list of orders with the configured engine, calling `on_order(index, order)` (one call at a time) as each order is done
+    Orders that still fail after retrying are reported through `on_failure(index, error)` instead of stopping the scrape
+    """
 
-            items.append((num, qty))
+    total = len(order_nums)
 
-        data.append((
-            po,
-            carrier,
-            status,
-            warehouse,
-            ship_status,
-            items,
-        ))
+    if not order_nums:
+        return
 
-        if cmd_options["debug"]:
-            print(data[-1])
+    if cmd_options["engine"] == "http":
+        session = orders.create_session(driver.get_cookies(), driver.execute_script("return navigator.userAgent"), cmd_options["workers"])
+
+        if RECORDER is not None:
+            session.hooks["response"].append(RECORDER.response_hook(site_url))
+
+        with session:
+            orders.fetch_orders(
+                session, site_url, order_nums, cmd_options["workers"], on_order, on_failure, cmd_options["retries"], cmd_options["backoff"], timer
+            )
+
+        return
+
+    if cmd_options["workers"] > 1 and not cmd_options["pause"]:
+        workers = [create_driver(cmd_options, temp_dir) for _ in range(min(cmd_options["workers"], total) - 1)]
+
+        try:
+            worker_waits = [WebDriverWait(worker, 10) for worker in workers]
+
+            cookies = driver.get_cookies()
+
+            # the workers reuse the logged in session, only logging in themselves if that fails
+            for worker, worker_wait in zip(workers, worker_waits):
+                set_cookies(worker, cookies)
+                ensure_login(worker, worker_wait, site_url, username, password)
+
+            scrape_orders([driver] + workers, [wait] + worker_waits, site_url, order_nums, cmd_options, on_order, on_failure, timer)
+        finally:
+            for worker in workers:
+                worker.quit()
+
+        return
+
+    for i, order_num in enumerate(order_nums):
+        try:
+            order = scrape_order_retrying(driver, wait, site_url, order_num, cmd_options, timer)
+        except SCRAPE_ERRORS as e:
+            on_failure(i, e)
+        else:
+            on_order(i, order)
 
         if cmd_options["pause"]:
             while True: pass
 
 
-def parse_cmd_options():
+def scrape(driver, data, wait, site, cmd_options, temp_dir, username, password, order_cache=None, timer=timing.NO_TIMER, journal=None, snapshot=None):
     """
-    Parse options passed from the command line
+    Scrape one website and add all the data to `data` (a list or anything with an `append` method, such as a `sheets.ReportBuilder`)
+    Rows are appended in report order as soon as they (and all the orders before them) are scraped
+    Orders found in `order_cache` that are not stale (or already in `journal` when resuming) are reused instead of scraped again
+    Every order is also added to `snapshot` (a `snapshot.SnapshotWriter`) if given
+    Returns the (order number, error) of every order that could not be scraped (left out of `data`)
     """
 
-    opts = {
-        "show_progress": False, # show how much total progress has been made by printing to stdout
-        "non_headless": False,  # don't operate in headless mode (show browser window)
-        "pause": False,         # pause on the first order (for inspecting)
-        "debug": False,         # debug the data
-    }
+    site_url = f"{cmd_options['base_url']}/{site}"
+    as_of = date.fromisoformat(cmd_options["as_of"])
 
-    for opt in sys.argv:
-        if opt in opts:
-            opts[opt] = True
+    with timer.span("login", site=site):
+        ensure_login(driver, wait, site_url, username, password)
 
-    return opts
+    with timer.span("report", site=site):
+        report_button = wait.until(expected_conditions.presence_of_element_located((By.CSS_SELECTOR, "#btnPendingShipment")))
+        clear_files(temp_dir)
+        report_button.click()
+        sheet_path = query_sheet(temp_dir, cmd_options["download_timeout"])
+        order_nums = sheets.extract_order_nums(sheet_path)
 
+        if RECORDER is not None:
+            RECORDER.save_file(site_url, "reports/pending.xlsx", sheet_path)
 
-def main():
-    cmd_options = parse_cmd_options()
-    temp_dir = os.path.join(gettempdir(), f"scraped_report{random()}")
-    Path(temp_dir).mkdir(parents=True, exist_ok=False)
+    cached = {}
+
+    if order_cache is not None:
+        cached = order_cache.get_fresh(site, order_nums, cmd_options["cache_hours"] * 3600)
+        order_cache.prune(site, order_nums)
+
+    if journal is not None:
+        cached.update(journal.done(site))
+
+    total = len(order_nums)
+    to_fetch = [i for i, order_num in enumerate(order_nums) if order_num not in cached]
+    pending = {i: cached[order_num] for i, order_num in enumerate(order_nums) if order_num in cached}
+    failures = []
+    failures_in_a_row = 0
+    next_i = 0
+    done = 0
+
+    def emit():
+        """
+        Append every order that is ready (and follows the last appended one) to `data`
+        """
+
+        nonlocal next_i
+        ready = []
+
+        while next_i in pending:
+            order = pending.pop(next_i)
+            next_i += 1
+
+            if order is not None: # failed
+                ready.append(order)
+
+        if snapshot is not None:
+            snapshot.extend(site, ready)
+
+        # ship statuses are always recomputed since they depend on the date
+        for row in orders.order_rows(ready, as_of):
+            data.append(row)
+
+    def on_order(fetch_i, order):
+        nonlocal done, failures_in_a_row
+        i = to_fetch[fetch_i]
+        done += 1
+        failures_in_a_row = 0
+
+        if cmd_options["show_progress"]:
+            print(f"{done}/{len(to_fetch)} ({site})")
+
+        if cmd_options["debug"]:
+            print(order)
+
+        if order_cache is not None:
+            order_cache.put_many(site, [(order_nums[i], order)])
+
+        if journal is not None:
+            journal.record(site, order_nums[i], order)
+
+        pending[i] = order
+        emit()
+
+    def on_failure(fetch_i, error):
+        nonlocal done, failures_in_a_row
+        i = to_fetch[fetch_i]
+        done += 1
+        failures_in_a_row += 1
+        print(f"Failed to scrape order {order_nums[i]} ({site}): {error}")
+
+        if journal is not None:
+            journal.record_failure(site, order_nums[i], error)
+
+        failures.append((order_nums[i], error))
+        pending[i] = None
+        emit()
+
+        if failures_in_a_row >= cmd_options["max_failures"]:
+            raise orders.SessionError(f"{failures_in_a_row} orders in a row failed on {site}, giving up (last error: {error})")
+
+    emit()
+
+    with timer.span("orders", site=site, count=len(to_fetch), cached=len(cached)):
+        fetch_orders(
+            driver, wait, site_url, [order_nums[i] for i in to_fetch], cmd_options, temp_dir, username, password, on_order, on_failure, timer
+        )
+
+    assert next_i == total
+
+    return failures
+
+
+def create_driver(cmd_options, download_dir):
+    """
+    Start a new chrome driver that downloads files into `download_dir`
+    """
 
     capabilities = DesiredCapabilities().CHROME
     capabilities["pageLoadStrategy"] = "none"
@@ -221,24 +467,249 @@ def main():
         options.add_argument("--disable-gpu")
         options.add_argument("--headless")
 
-    options.add_experimental_option("prefs", { "download.default_directory": temp_dir })
+    prefs = { "download.default_directory": download_dir }
+
+    if cmd_options["light"]:
+        prefs["profile.managed_default_content_settings.images"] = 2
+        prefs["profile.default_content_setting_values.notifications"] = 2
+
+        for arg in LIGHT_ARGS:
+            options.add_argument(arg)
+
+    options.add_experimental_option("prefs", prefs)
 
     driver = webdriver.Chrome("C:/Selenium/chromedriver.exe", chrome_options=options, desired_capabilities=capabilities)
-    wait = WebDriverWait(driver, 10)
-    data = []
+
+    if cmd_options["light"]:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+
+    return driver
+
+
+def parse_cmd_options(extra_opts=None):
+    """
+    Parse options passed from the command line (`extra_opts` adds options with their defaults)
+    """
+
+    opts = {
+        "show_progress": False, # show how much total progress has been made by printing to stdout
+        "non_headless": False,  # don't operate in headless mode (show browser window)
+        "pause": False,         # pause on the first order (for inspecting)
+        "debug": False,         # debug the data
+        "workers": 1,           # number of logged in browser sessions scraping orders in parallel (ex: 'workers=4')
+        "engine": "browser",    # how order pages are fetched: 'browser' (chrome) or 'http' (plain requests reusing the login cookies)
+        "base_url": "https://www2.order-fulfillment.bz", # site to scrape (ex: a local stand-in server)
+        "download_timeout": 60, # seconds to wait for the pending shipment report to download
+        "cache": "",            # sqlite file to cache scraped orders in between runs (ex: 'cache=orders.db')
+        "cache_hours": 24.0,    # how long a cached order is reused before it is scraped again
+        "sites": "homebeyond,vanityart", # comma separated sites to scrape (concurrently)
+        "reader": sheets.ROW_READER, # backend used to read workbooks: 'openpyxl' or 'xml' (faster)
+        "as_of": "",            # date ship statuses are computed against (YYYY-MM-DD, default today)
+        "max_delay": sheets.MAX_DELAY, # business days before an unshipped order is late
+        "holidays": "",         # file of holiday dates (one YYYY-MM-DD per line) that don't count as business days
+        "timing": False,        # print a summary of how long each stage of the scrape took
+        "timing_file": "",      # file to append every timing span to as json lines (implies 'timing')
+        "light": False,         # block images, fonts, stylesheets and tracking scripts and turn off unneeded browser features
+        "output_format": "xlsx", # format of the report: 'xlsx', 'csv' or 'jsonl'
+        "streaming": False,     # write the xlsx report row by row (for very large reports)
+        "retries": 2,           # times a failing order is retried before it is left out of the report
+        "max_failures": 5,      # orders in a row that may fail before the site is given up (ex: the session expired)
+        "backoff": 2.0,         # seconds before the first retry (doubled every retry)
+        "journal": "scrape_journal.jsonl", # file every scraped order is journaled to as the run goes (relative to 'output_dir', empty to disable)
+        "resume": False,        # reuse the orders journaled by an interrupted run instead of scraping them again
+        "by_warehouse": False,  # also write a report per warehouse (built and written in parallel processes)
+        "snapshot": False,      # save the scraped orders as a columnar snapshot next to the report (see 'python sheets.py snapshot=...')
+        "diff": False,          # also write the changes since the previous run (new late POs, cleared POs, quantity changes)
+        "state_file": "scraped_state.json", # summary of the last report that 'diff' compares against (relative to 'output_dir')
+        "output_dir": "",       # directory the report and the files written with it go to (default the current directory)
+        "cookies": "",          # file to keep every site's login cookies in between runs (ex: 'cookies=cookies.json'), skips logging in while they are valid
+                                # (encrypted for the current user on Windows, readable only by its owner elsewhere)
+        "record": "",           # directory to save every page visited in, for replaying offline with replay.py (ex: 'record=recordings')
+        **(extra_opts or {}),
+    }
+
+    for opt in sys.argv:
+        name, _, value = opt.partition("=")
+
+        if name not in opts:
+            continue
+
+        if isinstance(opts[name], bool):
+            opts[name] = True
+        elif value:
+            opts[name] = type(opts[name])(value)
+
+    return opts
+
+
+class SiteSession(object):
+    """
+    A browser (with its own download directory) dedicated to one website, kept open between scrapes
+    """
+
+    def __init__(self, site, cmd_options, cookies=None):
+        self.site = site
+        self.cmd_options = cmd_options
+        self.cookies = cookies # `cookie_store.CookieStore` the session's cookies are restored from and saved to
+        self.temp_dir = mkdtemp(prefix=f"scraped_report_{site}_")
+        self.driver = None
+        self.wait = None
+        self.start()
+
+    def start(self):
+        self.driver = create_driver(self.cmd_options, self.temp_dir)
+        self.wait = WebDriverWait(self.driver, 10)
+
+        # `scrape` checks the session is still logged in, so expired cookies only cost a login
+        if self.cookies is not None:
+            set_cookies(self.driver, self.cookies.get(self.site))
+
+    def restart(self):
+        """
+        Replace the browser (ex: after it crashed)
+        """
+
+        self.close()
+        self.start()
+
+    def close(self):
+        try:
+            self.driver.quit()
+        except WebDriverException: # already gone
+            pass
+
+    def scrape(self, data, cmd_options, username, password, order_cache=None, timer=timing.NO_TIMER, journal=None, snapshot=None):
+        """
+        Scrape the site, adding its data to `data`, returning the orders that failed
+        """
+
+        with timer.span("site", site=self.site):
+            failures = scrape(
+                self.driver, data, self.wait, self.site, cmd_options, self.temp_dir, username, password, order_cache, timer, journal, snapshot
+            )
+
+        if self.cookies is not None:
+            self.cookies.put(self.site, self.driver.get_cookies())
+
+        return failures
+
+
+def run(sessions, cmd_options, username, password, warehouses, order_cache=None):
+    """
+    Scrape every site concurrently and write the report, returning its path
+    """
+
+    # the date is frozen for the whole run
+    cmd_options = dict(cmd_options, as_of=cmd_options["as_of"] or date.today().isoformat())
+    output_dir = cmd_options["output_dir"]
+    output_path = os.path.join(output_dir, f"scraped_{cmd_options['as_of']}.{cmd_options['output_format']}")
+    class_lookup, combo_lookup = sheets.load_lookups()
+
+    # scraped rows are grouped as they arrive instead of being collected first (in site order, whichever site is faster)
+    builder = sheets.ReportBuilder(warehouses, class_lookup, combo_lookup, keep_rows=cmd_options["by_warehouse"])
+    feeds = sheets.OrderedFeeds(builder, len(sessions))
+    timer = timing.Timer(cmd_options["timing"] or bool(cmd_options["timing_file"]), cmd_options["timing_file"])
+    run_journal = journal.Journal(os.path.join(output_dir, cmd_options["journal"]), cmd_options["resume"]) if cmd_options["journal"] else None
+    snapshot_writer = snapshot.SnapshotWriter() if cmd_options["snapshot"] else None
+
+    def scrape_session(i):
+        try:
+            return sessions[i].scrape(feeds.feed(i), cmd_options, username, password, order_cache, timer, run_journal, snapshot_writer)
+        finally:
+            feeds.finish(i)
+
+    try:
+        # every site has its own browser, so the run takes as long as the slowest site
+        with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+            failures = dict(zip((session.site for session in sessions), executor.map(scrape_session, range(len(sessions)))))
+    except BaseException:
+        feeds.flush()
+        partial_path = os.path.join(output_dir, f"scraped_partial_{cmd_options['as_of']}.{cmd_options['output_format']}")
+        sheets.write_report(builder.report(), partial_path, cmd_options["streaming"])
+        print(f"Scraping failed, wrote the orders scraped so far to {partial_path}")
+
+        if run_journal is not None:
+            print(f"Run again with 'resume' to continue from {run_journal.path}")
+
+        raise
+    finally:
+        timer.close()
+
+        if run_journal is not None:
+            run_journal.close()
+
+        if timer.enabled:
+            print(timer.summary())
+
+    output_data = builder.report()
+
+    for error in builder.errors:
+        print(f"Data error: {error}")
+
+    if cmd_options["by_warehouse"]:
+        sheets.write_reports_by_warehouse(builder.rows, warehouses, class_lookup, combo_lookup, output_path, cmd_options["streaming"], output_data)
+    else:
+        sheets.write_report(output_data, output_path, cmd_options["streaming"])
+
+    if cmd_options["diff"]:
+        state = sheets.report_state(output_data)
+        state_path = os.path.join(output_dir, cmd_options["state_file"])
+        changes = sheets.diff_report_states(sheets.load_report_state(state_path), state)
+        delta_path = os.path.join(output_dir, f"scraped_{cmd_options['as_of']}_delta.{cmd_options['output_format']}")
+        sheets.write_delta(changes, delta_path)
+        sheets.save_report_state(state, state_path)
+        print(f"{len(changes)} changes since the previous run written to {delta_path}")
+
+    if snapshot_writer is not None:
+        snapshot_writer.save(os.path.join(output_dir, f"scraped_{cmd_options['as_of']}.snapshot"), cmd_options["as_of"])
+
+    for site, site_failures in failures.items():
+        if site_failures:
+            print(f"{len(site_failures)} orders of {site} could not be scraped and are missing from the report: {', '.join(num for num, _ in site_failures)}")
+
+    # a complete run leaves nothing to resume
+    if run_journal is not None and not any(failures.values()):
+        os.remove(run_journal.path)
+
+    return output_path
+
+
+def configure(cmd_options):
+    """
+    Apply the options that change module wide settings
+    """
+
+    global RECORDER
+
+    sheets.ROW_READER = cmd_options["reader"]
+    sheets.MAX_DELAY = cmd_options["max_delay"]
+    RECORDER = recording.Recorder(cmd_options["record"]) if cmd_options["record"] else None
+
+    if cmd_options["holidays"]:
+        sheets.HOLIDAYS = sheets.load_holidays(cmd_options["holidays"])
+
+
+def main():
+    cmd_options = parse_cmd_options()
+    configure(cmd_options)
 
     username = input("Username:\n")
     password = input("Password:\n")
+    warehouses = sheets.input_warehouses()
 
-    scrape(driver, data, wait, "homebeyond", cmd_options, temp_dir, username, password)
-    scrape(driver, data, wait, "vanityart",  cmd_options, temp_dir, username, password)
+    cookies = cookie_store.CookieStore(cmd_options["cookies"]) if cmd_options["cookies"] else None
+    sessions = [SiteSession(site, cmd_options, cookies) for site in cmd_options["sites"].split(",") if site]
+    order_cache = cache.OrderCache(cmd_options["cache"]) if cmd_options["cache"] else None
 
-    class_lookup = sheets.load_class_lookup("class_lookup.xlsx")
-    combo_lookup = sheets.load_combo_lookup("combo_lookup.xlsx")
-    warehouses = sheets.input_warehouses()
-    output_data = sheets.parse_data(data, warehouses, class_lookup, combo_lookup)
+    try:
+        run(sessions, cmd_options, username, password, warehouses, order_cache)
+    finally:
+        for session in sessions:
+            session.close()
 
-    sheets.write_data(output_data, f"scraped_{date.today()}.xlsx")
+        if order_cache is not None:
+            order_cache.close()
 
 
 if __name__ == "__main__":
@@ -2,16 +2,77 @@
 Module for reading/writing of google sheets with item data
 """
 
+import os
+import sys
+import csv
+import pickle
+import hashlib
 import openpyxl
+import re
 import itertools
+import threading
+from math import gcd
+from functools import lru_cache
+from collections import namedtuple
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 import numpy as np
-from datetime import datetime
+from datetime import datetime, date
+import json
 from json import dumps
+import xlsx
+import snapshot
 
 COMBOS = ["VA30", "VA31"]
 WAREHOUSE_IDS = ["NY", "CA", "TX"]
 IGNORED_CARRIERS = ["Fedex", "Ups"]
 MAX_DELAY = 2
+HOLIDAYS = [] # dates skipped when counting business days (see `load_holidays`)
+ROW_READER = "openpyxl" # backend used to stream workbook rows (see `ROW_READERS`)
+LOOKUP_CACHE_SUFFIX = ".cache"
+LOOKUP_CACHE_VERSION = 1 # bump when the lookup loaders change what they produce
+SKU_CACHE_SIZE = 16384 # distinct item numbers kept parsed
+LETTER = re.compile(r"[^\W\d_]") # same characters as str.isalpha (for item numbers)
+# an item number split into its parts:
+#   base: the number without dashes or color, size: last 2 digits of base, color: the rest
+#   prefix: everything before the first dash, stripped: the number with color after the dash removed (None without a dash)
+Sku = namedtuple("Sku", ["num", "base", "size", "color", "prefix", "stripped"])
+COLUMN_HEADERS = [
+    "Class",
+    "Item",
+    "Total Qty",
+    "Late Qty",
+    "Late Qtys",
+    "PO",
+    "Carrier",
+    "Warehouse",
+]
+
+
+@lru_cache(maxsize=SKU_CACHE_SIZE)
+def parse_sku(num):
+    """
+    Parses an item number into all the pieces the grouping logic uses (cached since the same skus repeat across orders)
+    """
+
+    # base/color: the dashes are dropped and the color starts at the first letter after the first 2 characters
+    joined = num.replace("-", "")
+    letter = LETTER.search(joined, 2)
+    color_index = letter.start() if letter else len(joined)
+    base = joined[:color_index]
+
+    # prefix/stripped: split around the first dash (color letters are only stripped if they follow a dash)
+    dash_i = num.find("-")
+    prefix = num[:dash_i] if dash_i >= 0 else num
+    stripped = None
+
+    if dash_i >= 0:
+        letter = LETTER.search(num, dash_i)
+        stripped = num[:letter.start()] if letter else num
+
+    return Sku(num, base, base[-2:], joined[color_index:], prefix, stripped)
 
 
 def decompose_item_num(item_num):
@@ -19,14 +80,43 @@ def decompose_item_num(item_num):
     Removes color information from an item number
     """
 
-    item_num = item_num.replace("-", "")
+    sku = parse_sku(item_num)
+    return sku.base, sku.color
+
+
+def openpyxl_rows(path, min_row=1):
+    """
+    Stream the rows of the active sheet with openpyxl's read only mode
+    """
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
 
     try:
-        color_index = next(i for i, c in enumerate(item_num[2:]) if c.isalpha()) + 2
-    except StopIteration:
-        color_index = len(item_num)
+        yield from workbook.active.iter_rows(min_row=min_row, values_only=True)
+    finally:
+        workbook.close()
+
 
-    return item_num[:color_index], item_num[color_index:]
+ROW_READERS = {
+    "openpyxl": openpyxl_rows,
+    "xml": xlsx.iter_rows, # parses the xlsx xml directly (faster)
+}
+
+
+def iter_rows(path, min_row=1):
+    """
+    Stream the rows of the active sheet of a workbook as tuples of values, starting at row `min_row`
+    """
+
+    return ROW_READERS[ROW_READER](path, min_row)
+
+
+def cell(row, col):
+    """
+    Value of the cell in column `col` (1 based) of a row tuple (None if the row is shorter)
+    """
+
+    return row[col - 1] if col <= len(row) else None
 
 
 def extract_order_nums(path):
@@ -34,16 +124,15 @@ def extract_order_nums(path):
     Extracts order numbers from a google sheet downloaded from the order website
     """
 
-    sheet = openpyxl.load_workbook(path).active
     order_nums = []
 
-    for row in range(2, sheet.max_row + 1):
-        order_num = str(sheet.cell(row, 3).value)
+    for row in iter_rows(path, 2):
+        order_num = cell(row, 3)
 
         if order_num is None:
             break
 
-        order_nums.append(order_num)
+        order_nums.append(str(order_num))
 
     return order_nums
 
@@ -53,15 +142,12 @@ def strip_color(num):
     Strips color information from an item only if it follows a dash
     """
 
-    dash_i = num.index("-")
+    stripped = parse_sku(num).stripped
 
-    try:
-        color_i = next(i for i, c in enumerate(num[dash_i:]) if c.isalpha()) + dash_i
-        num = num[:color_i]
-    except StopIteration:
-        pass
+    if stripped is None:
+        raise ValueError(f"{num} has no dash")
 
-    return num
+    return stripped
 
 
 def input_warehouses():
@@ -89,9 +175,23 @@ def input_warehouses():
     return [WAREHOUSE_IDS[wh] for wh in warehouses]
 
 
-def load_class_lookup(path):
+def lookup_row_error(path, row_num, message, errors):
+    """
+    Report a malformed lookup row: collected into `errors` if given, raised otherwise
+    """
+
+    error = f"{path} row {row_num}: {message}"
+
+    if errors is None:
+        raise ValueError(error)
+
+    errors.append(error)
+
+
+def load_class_lookup(path, errors=None):
     """
     Loads a class lookup sheet
+    Malformed rows are skipped and described in `errors` (a list) if given, otherwise they raise a ValueError
     """
 
     def parse_lookup_item_nums(item_nums_raw):
@@ -102,62 +202,365 @@ def load_class_lookup(path):
         if item_nums_raw is None:
             return []
 
+        item_nums_raw = str(item_nums_raw)
+
         try:
             item_nums_raw = item_nums_raw[:item_nums_raw.index("/")]
         except ValueError:
             pass
         return item_nums_raw.split(":")
 
-    class_lookup_sheet = openpyxl.load_workbook(path).active
     class_lookup = {}
 
-    for row in range(2, class_lookup_sheet.max_row + 1):
-        item_num_raw = class_lookup_sheet.cell(row, 2).value
-        class_name = class_lookup_sheet.cell(row, 1).value
+    for row_num, row in enumerate(iter_rows(path, 2), 2):
+        item_num_raw = cell(row, 2)
+        class_name = cell(row, 1)
+        item_nums = parse_lookup_item_nums(item_num_raw)
+
+        if item_nums and class_name is None:
+            lookup_row_error(path, row_num, f"items {item_num_raw!r} have no class", errors)
+            continue
 
-        for item_num in parse_lookup_item_nums(item_num_raw):
+        for item_num in item_nums:
             class_lookup[item_num] = class_name
 
     return class_lookup
 
 
-def load_combo_lookup(path):
+def load_combo_lookup(path, errors=None):
     """
     Loads a combo lookup sheet
+    Malformed rows are skipped and described in `errors` (a list) if given, otherwise they raise a ValueError
     """
 
-    combo_lookup_sheet = openpyxl.load_workbook(path).active
+    def parse_combo_piece(piece_raw):
+        """
+        Parses a piece of a combo ("Nx PIECE") into the piece and its quantity
+        """
+
+        try:
+            qty, piece = piece_raw.split()
+            return piece, int(qty[:-2])
+        except (AttributeError, ValueError):
+            raise ValueError(f"invalid combo piece {piece_raw!r}")
+
     combo_lookup = {}
 
-    for row in range(4, combo_lookup_sheet.max_row + 1):
-        combo = combo_lookup_sheet.cell(row, 1).value
+    for row_num, row in enumerate(iter_rows(path, 4), 4):
+        combo = cell(row, 1)
 
         if combo is None:
             break
 
-        qty1, piece1 = combo_lookup_sheet.cell(row, 2).value.split()
-        qty2, piece2 = combo_lookup_sheet.cell(row, 3).value.split()
+        try:
+            piece1, qty1 = parse_combo_piece(cell(row, 2))
+            piece2, qty2 = parse_combo_piece(cell(row, 3))
+        except ValueError as e:
+            lookup_row_error(path, row_num, str(e), errors)
+            continue
 
         combo_pieces = {}
-        combo_pieces[piece1] = int(qty1[:-2])
-        combo_pieces[piece2] = int(qty2[:-2])
+        combo_pieces[piece1] = qty1
+        combo_pieces[piece2] = qty2
         combo_lookup[combo] = combo_pieces
 
     return combo_lookup
 
 
-class Item(object):
+def load_cached_lookup(path, loader, errors=None):
+    """
+    Loads a lookup sheet with `loader`, reusing a compiled copy cached next to the sheet while the sheet is unchanged
+    (checked by modification time, then by content hash)
+    """
+
+    cache_path = path + LOOKUP_CACHE_SUFFIX
+    stat = os.stat(path)
+    key = (LOOKUP_CACHE_VERSION, loader.__name__)
+    digest = None
+    cached = None
+
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    stale = True
+
+    if isinstance(cached, dict) and cached.get("key") == key:
+        stale = cached["mtime"] != stat.st_mtime_ns
+
+        if stale:
+            digest = file_digest(path)
+
+            if digest != cached["digest"]:
+                cached = None
+            else: # touched but unchanged, keep the lookup and only record the new modification time
+                cached["mtime"] = stat.st_mtime_ns
+    else:
+        cached = None
+
+    if cached is None:
+        lookup_errors = []
+        cached = {
+            "key": key,
+            "mtime": stat.st_mtime_ns,
+            "digest": digest or file_digest(path),
+            "lookup": loader(path, lookup_errors),
+            "errors": lookup_errors,
+        }
+
+    if stale:
+        try:
+            with open(cache_path, "wb") as f:
+                pickle.dump(cached, f, pickle.HIGHEST_PROTOCOL)
+        except OSError: # the cache is only an optimization
+            pass
+
+    if errors is None and cached["errors"]:
+        raise ValueError(cached["errors"][0])
+
+    if errors is not None:
+        errors.extend(cached["errors"])
+
+    return cached["lookup"]
+
+
+def file_digest(path):
+    """
+    Returns the sha256 hex digest of a file's contents
+    """
+
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class ComboIndex(object):
+    """
+    Resolves combos by their pieces: every combo in the combo lookup is indexed by its color and (piece, qty) set
+    (quantities divided by their gcd), so an order's items are matched with a hash lookup instead of being turned into a guessed combo number
+    """
+
+    def __init__(self, combo_lookup):
+        self.combos = {}   # (color, frozenset of (piece, qty / gcd)) -> [(combo number, gcd of its quantities)]
+        self.by_piece = {} # (color, piece) -> [(combo number, {piece: qty})] of every combo using the piece
+
+        for combo in combo_lookup:
+            stripped = parse_sku(combo).stripped
+
+            # quantities are always counted from the colorless combo (see `ReportBuilder.compute_qtys`)
+            if stripped is None or stripped not in combo_lookup:
+                continue
+
+            color = combo[len(stripped):]
+            pieces = combo_lookup[stripped]
+            multiple = gcd(*pieces.values())
+
+            if multiple == 0:
+                continue
+
+            combos = self.combos.setdefault((color, frozenset((piece, qty // multiple) for piece, qty in pieces.items())), [])
+
+            if any(multiple == other for _, other in combos):
+                continue
+
+            combos.append((combo, multiple))
+
+            for piece in pieces:
+                self.by_piece.setdefault((color, piece), []).append((combo, pieces))
+
+    def resolve(self, items):
+        """
+        Returns the combo number made of exactly `items` ((item number, qty) pairs, any multiple of one combo), or None
+        """
+
+        colors = set()
+        counts = {}
+
+        for num, qty in items:
+            sku = parse_sku(num)
+            colors.add(sku.color)
+            counts[sku.prefix] = counts.get(sku.prefix, 0) + int(qty)
+
+        if len(colors) != 1 or len(counts) < 2:
+            return None
+
+        multiple = gcd(*counts.values())
+
+        if multiple == 0:
+            return None
+
+        combos = self.combos.get((colors.pop(), frozenset((piece, qty // multiple) for piece, qty in counts.items())), [])
+
+        # the items must make whole combos (ex: 1 of each piece isn't a combo of 2 of each)
+        for combo, combo_multiple in combos:
+            if multiple % combo_multiple == 0:
+                return combo
+
+        return None
+
+    def split(self, items):
+        """
+        Split an order's items into groups: one per combo it contains and one per loose item left over
+        An order without a combo (or that is exactly one combo) stays a single group
+        """
+
+        if len(items) < 2 or self.resolve(items) is not None:
+            return [items]
+
+        lines = [] # [item number, qty left, color, piece, original qty]
+        counts = {} # (color, piece) -> qty left
+
+        for num, qty in items:
+            sku = parse_sku(num)
+            lines.append([num, int(qty), sku.color, sku.prefix, qty])
+            counts[(sku.color, sku.prefix)] = counts.get((sku.color, sku.prefix), 0) + int(qty)
+
+        groups = []
+
+        for _, _, color, piece, _ in list(lines):
+            for combo, pieces in self.by_piece.get((color, piece), []):
+                multiple = min(counts.get((color, combo_piece), 0) // qty for combo_piece, qty in pieces.items())
+
+                if multiple:
+                    groups.append(self.take(lines, counts, color, pieces, multiple))
+
+        if not groups:
+            return [items]
+
+        # the quantities keep the type they came in with (scraped quantities are strings)
+        return groups + [[(num, type(qty)(left))] for num, left, _, _, qty in lines if left]
+
+    def take(self, lines, counts, color, pieces, multiple):
+        """
+        Remove `multiple` times a combo's pieces from the item lines, returning them as (item number, qty) pairs
+        """
+
+        group = []
+
+        for piece, qty in pieces.items():
+            needed = qty * multiple
+            counts[(color, piece)] -= needed
+
+            for line in lines:
+                num, left, line_color, line_piece, original = line
+
+                if needed and left and line_color == color and line_piece == piece:
+                    taken = min(left, needed)
+                    line[1] -= taken
+                    needed -= taken
+                    group.append((num, type(original)(taken)))
+
+        return group
+
+
+class ItemTable(object):
     """
-    An object representing an individual item
+    Column store for the items of many entries
+    Repeated strings (item numbers, carriers, warehouses, ship statuses) are stored once and referred to by small codes
     """
 
+    __slots__ = ("strings", "codes", "nums", "qtys", "ship_statuses", "pos", "carriers", "warehouses")
+
     def __init__(self):
-        self.num = None
-        self.qty = None
-        self.ship_status = None
-        self.po = None
-        self.carrier = None
-        self.warehouse = None
+        self.strings = [] # code -> value
+        self.codes = {}   # value -> code
+        self.nums = array("I")
+        self.qtys = []
+        self.ship_statuses = array("I")
+        self.pos = [] # mostly unique, so not coded
+        self.carriers = array("I")
+        self.warehouses = array("I")
+
+    def __len__(self):
+        return len(self.qtys)
+
+    def __getitem__(self, index):
+        return Item(self, index)
+
+    def code(self, value):
+        """
+        Returns the code of a value (adding it if it is new)
+        """
+
+        code = self.codes.get(value)
+
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+
+        return code
+
+    def add(self, num, qty, ship_status, po, carrier, warehouse):
+        """
+        Adds an item and returns its index
+        """
+
+        self.nums.append(self.code(num))
+        self.qtys.append(qty)
+        self.ship_statuses.append(self.code(ship_status))
+        self.pos.append(po)
+        self.carriers.append(self.code(carrier))
+        self.warehouses.append(self.code(warehouse))
+
+        return len(self.qtys) - 1
+
+    def row(self, index):
+        """
+        Returns the values of an item (in the order `add` takes them)
+        """
+
+        return (self.num(index), self.qty(index), self.ship_status(index), self.po(index), self.carrier(index), self.warehouse(index))
+
+    def truncate(self, length):
+        """
+        Removes every item from index `length` on
+        """
+
+        for column in (self.nums, self.qtys, self.ship_statuses, self.pos, self.carriers, self.warehouses):
+            del column[length:]
+
+    def num(self, index):
+        return self.strings[self.nums[index]]
+
+    def qty(self, index):
+        return self.qtys[index]
+
+    def ship_status(self, index):
+        return self.strings[self.ship_statuses[index]]
+
+    def po(self, index):
+        return self.pos[index]
+
+    def carrier(self, index):
+        return self.strings[self.carriers[index]]
+
+    def warehouse(self, index):
+        return self.strings[self.warehouses[index]]
+
+
+class Item(object):
+    """
+    An object representing an individual item (a view of one row of an `ItemTable`)
+    """
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    num = property(lambda self: self.table.num(self.index))
+    qty = property(lambda self: self.table.qty(self.index))
+    ship_status = property(lambda self: self.table.ship_status(self.index))
+    po = property(lambda self: self.table.po(self.index))
+    carrier = property(lambda self: self.table.carrier(self.index))
+    warehouse = property(lambda self: self.table.warehouse(self.index))
 
     def __str__(self):
         return f"[ {self.num} | {self.qty} | {self.ship_status} | {self.po} | {self.carrier} | {self.warehouse} ]"
@@ -168,95 +571,68 @@ class Entry(object):
     An object representing a group of items (a row in the output sheet)
     """
 
-    def __init__(self):
-        self.items = []
+    __slots__ = ("table", "indices", "special_order", "uid", "is_combo", "total_qty", "late_qty")
+
+    def __init__(self, table):
+        self.table = table
+        self.indices = [] # indices of this entry's items in `table`
         self.special_order = False
         self.uid = None
         self.is_combo = False
         self.total_qty = None
         self.late_qty = None
 
+    @property
+    def items(self):
+        return [self.table[i] for i in self.indices]
+
     def __str__(self):
         item_str = "\n\t".join(map(str, self.items))
         special_order_char = '*' if self.special_order else ' '
         return f"[{special_order_char}] {self.uid}\n\t{item_str}\n"
 
-    def count_qtys(self, late, combo_lookup):
+    def add_item(self, num, qty, ship_status, po, carrier, warehouse):
         """
-        Compute the total quantity of a combo entry
+        Add an item to this entry
         """
 
-        # the following piece of logic selects either all late items or all items based on the boolean `late`
-        # if its true then only late items are selected, otherwise all items are selected
-        items = [item for item in self.items if not (item.ship_status != "Late" and late)]
-        counts = {}
-        combo = combo_lookup[strip_color(self.uid)]
-
-        for item in items:
-            key = item.num
-
-            try:
-                key = key[:key.index("-")]
-            except ValueError:
-                pass
+        self.indices.append(self.table.add(num, qty, ship_status, po, carrier, warehouse))
 
-            counts[key] = counts.get(key, 0) + item.qty
-
-        vals = [v // combo[k] for k, v in counts.items()]
-
-        if not vals:
-            return 0
-
-        assert(all(val == vals[0] for val in vals))
-        return vals[0]
-
-    # maybe combine with count_qtys
-    def compute_qtys(self, combo_lookup):
+    def compute_uid(self, combo_index):
         """
-        Figure out the total quantity
+        Find a unique identifier for this entry (entries with shared uids are combined into one)
+        Combos are resolved from their pieces with `combo_index` (a `ComboIndex`)
         """
 
-        if self.is_combo:
-            self.total_qty = self.count_qtys(False, combo_lookup)
-            self.late_qty = self.count_qtys(True, combo_lookup)
-        else:
-            self.total_qty = sum(int(item.qty) for item in self.items)
-            self.late_qty = sum(int(item.qty) for item in self.items if item.ship_status == "Late")
+        items = self.items
 
-    def compute_uid(self, combo_lookup):
-        """
-        Find a unique identifier for this entry (entries with shared uids are combined into one)
-        """
+        if len(items) == 1:
+            self.uid = items[0].num
+            return
 
-        if len(self.items) == 1:
-            self.uid = self.items[0].num
+        combo = combo_index.resolve([(item.num, item.qty) for item in items])
+
+        if combo is not None:
+            self.uid = combo
+            self.is_combo = True
             return
 
-        decomposed = [decompose_item_num(item.num) for item in self.items]
-        colors = [d[1] for d in decomposed]
+        self.is_combo = False
+        colors = [parse_sku(item.num).color for item in items]
 
-        if not all(any(item.num.startswith(combo) for combo in COMBOS) for item in self.items) or any(color != colors[0] for color in colors):
+        if not all(any(item.num.startswith(combo) for combo in COMBOS) for item in items) or any(color != colors[0] for color in colors):
             self.special_order = True
-            self.uid = "SPECIAL ORDER: " + "".join(f"\n\t{item.num} ({item.qty})" for item in self.items)
+            self.uid = "SPECIAL ORDER: " + "".join(f"\n\t{item.num} ({item.qty})" for item in items)
             return
 
-        raw_nums = [d[0] for d in decomposed]
-        num = sum(int(raw_num[-2:]) * int(item.qty) for raw_num, item in zip(raw_nums, self.items))
-        first = max(raw_nums, key=lambda v: int(v[2:]))
-        self.uid = f"{first}-{num}{colors[0]}"
-
-        if self.uid in combo_lookup:
-            self.is_combo = True
-        else:
-            self.uid = self.items[0].num
-            self.is_combo = False
+        self.uid = items[0].num
 
     def add_entry(self, entry):
         """
         Combine an entry into this one
         """
 
-        self.items.extend(entry.items)
+        self.indices.extend(entry.indices)
 
     def get_combo_num(self, combo_lookup):
         """
@@ -269,15 +645,14 @@ class Entry(object):
 
     def write_to(self, output_data, class_lookup, combo_lookup):
         """
-        Writes this entry to an output data array
+        Writes this entry to an output data array (its quantities must be computed, see `ReportBuilder.compute_qtys`)
         """
 
-        self.compute_qtys(combo_lookup)
-
-        class_name = class_lookup.get(self.items[0].num, "")
+        table = self.table
+        class_name = class_lookup.get(table.num(self.indices[0]), "")
         item_num = self.get_combo_num(combo_lookup) if self.is_combo else self.uid
 
-        to_display = [item for item in self.items if item.ship_status == "Late"]
+        to_display = [i for i in self.indices if table.ship_status(i) == "Late"]
 
         output_data.append({
             "data": [ # 2d array (array of columns)
@@ -285,131 +660,524 @@ class Entry(object):
                 [item_num],
                 [self.total_qty],
                 [self.late_qty],
-                [item.qty for item in to_display],
-                [item.po for item in to_display],
-                [item.carrier for item in to_display],
-                [item.warehouse for item in to_display],
+                [table.qty(i) for i in to_display],
+                [table.po(i) for i in to_display],
+                [table.carrier(i) for i in to_display],
+                [table.warehouse(i) for i in to_display],
             ],
 
             "merge": [ 1, 2, 3, 4], # columns to merge
         })
 
 
-def get_ship_status(order_time, status):
+def load_holidays(path):
     """
-    Determine the ship status ("Late" or "On Time") based on the order time and status ("shipped" or "not shipped")
+    Loads a holiday calendar (a text file with one YYYY-MM-DD date per line, '#' starts a comment)
     """
 
-    if order_time is None:
-        return "On Time"
+    holidays = []
+
+    with open(path) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+
+            if line:
+                holidays.append(date.fromisoformat(line))
 
-    date_fmt = "%Y-%m-%d"
-    current_time = datetime.now()
-    business_days = np.busday_count(order_time.strftime(date_fmt), current_time.strftime(date_fmt))
-    return "Late" if business_days > MAX_DELAY and status.lower() != "shipped" else "On Time"
+    return holidays
 
 
-def get_data(data_sheet):
+def get_ship_statuses(order_times, statuses, as_of=None, holidays=None, max_delay=None):
+    """
+    Determine the ship statuses ("Late" or "On Time") of many orders at once from their order times and statuses
+    Business days are counted up to a single `as_of` date (default today), skipping weekends and `holidays`
+    """
+
+    as_of = as_of or date.today()
+    holidays = HOLIDAYS if holidays is None else holidays
+    max_delay = MAX_DELAY if max_delay is None else max_delay
+
+    if isinstance(as_of, datetime):
+        as_of = as_of.date()
+
+    known = np.array([order_time is not None for order_time in order_times], dtype=bool)
+    order_days = np.array([order_time if order_time is not None else as_of for order_time in order_times], dtype="datetime64[D]")
+    shipped = np.array([status.lower() == "shipped" for status in statuses], dtype=bool)
+
+    business_days = np.busday_count(order_days, np.datetime64(as_of, "D"), holidays=np.array(holidays, dtype="datetime64[D]"))
+    late = known & (business_days > max_delay) & ~shipped
+
+    return np.where(late, "Late", "On Time").tolist()
+
+
+def get_ship_status(order_time, status, as_of=None):
+    """
+    Determine the ship status ("Late" or "On Time") based on the order time and status ("shipped" or "not shipped")
+    """
+
+    return get_ship_statuses([order_time], [status], as_of)[0]
+
+
+def get_data(path, as_of=None):
     """
     Extracts item data from a sheet
     """
 
     data = []
+    order_times = []
 
-    for row in range(2, data_sheet.max_row + 1):
-        po = data_sheet.cell(row, 1).value
-        order_time = data_sheet.cell(row, 3).value
-        carrier = data_sheet.cell(row, 6).value
-        status = data_sheet.cell(row, 7).value or "shipped"
-        warehouse = data_sheet.cell(row, 8).value
-        ship_status = get_ship_status(order_time, status)
+    for row in iter_rows(path, 2):
+        po = cell(row, 1)
+        order_time = cell(row, 3)
+        carrier = cell(row, 6)
+        status = cell(row, 7) or "shipped"
+        warehouse = cell(row, 8)
 
         items = []
 
-        for i in range(data_sheet.max_column + 1):
-            num = data_sheet.cell(row, 11 + i * 3).value
-            qty = data_sheet.cell(row, 12 + i * 3).value
+        for i in itertools.count():
+            num = cell(row, 11 + i * 3)
+            qty = cell(row, 12 + i * 3)
 
             if num is None:
                 break
 
             items.append((num, int(qty)))
 
+        order_times.append(order_time)
         data.append((
             po,
             carrier,
             status,
             warehouse,
-            ship_status,
+            None, # ship status (filled in below for all rows at once)
             items,
         ))
 
-    return data
+    ship_statuses = get_ship_statuses(order_times, [row[2] for row in data], as_of)
+
+    return [
+        (po, carrier, status, warehouse, ship_status, items)
+        for (po, carrier, status, warehouse, _, items), ship_status in zip(data, ship_statuses)
+    ]
 
 
-def parse_data(data, warehouses, class_lookup, combo_lookup):
+def get_snapshot_data(path, as_of=None, sites=None):
     """
-    Parse data extracted from a sheet
+    Extracts item data from a snapshot of scraped orders (see `snapshot`), optionally only from some `sites`
+    Ship statuses are computed against `as_of` (default the date of the scrape)
     """
 
-    entries = {}
+    meta, columns = snapshot.load(path)
+    strings = np.array(meta["strings"], dtype=object)
+    as_of = as_of or date.fromisoformat(meta["as_of"])
+
+    keep = np.ones(meta["orders"], dtype=bool)
+
+    if sites is not None:
+        keep = np.isin(strings[columns["site"]], sites)
+
+    statuses = strings[columns["status"]][keep].tolist()
+    ship_statuses = get_ship_statuses(columns["order_time"][keep].astype(object).tolist(), statuses, as_of)
+
+    item_start = columns["item_start"]
+    item_nums = strings[columns["item_num"]].tolist()
+    item_qtys = columns["item_qty"].tolist()
+    rows = zip(
+        np.flatnonzero(keep).tolist(),
+        strings[columns["po"]][keep].tolist(),
+        strings[columns["carrier"]][keep].tolist(),
+        statuses,
+        strings[columns["warehouse"]][keep].tolist(),
+        ship_statuses,
+    )
+
+    return [
+        (po, carrier, status, warehouse, ship_status, list(zip(item_nums[item_start[i]:item_start[i + 1]], item_qtys[item_start[i]:item_start[i + 1]])))
+        for i, po, carrier, status, warehouse, ship_status in rows
+    ]
 
-    for po, carrier, status, warehouse, ship_status, items in data:
-        entry = Entry()
 
-        if warehouse not in warehouses:
-            continue
+class ReportBuilder(object):
+    """
+    Groups data rows into entries as they arrive, so a (partial) report can be produced at any point
+    Late items are kept for display, while on time items of an entry with the same item number are folded into one,
+    so memory grows with the number of distinct entries rather than the number of orders
+    """
+
+    def __init__(self, warehouses, class_lookup, combo_lookup, keep_rows=False):
+        self.warehouses = warehouses
+        self.class_lookup = class_lookup
+        self.combo_lookup = combo_lookup
+        self.combo_index = ComboIndex(combo_lookup)
+        self.table = ItemTable()
+        self.entries = {}
+        self.on_time = {} # (uid, item number code) -> index of the folded on time item
+        self.rows = [] if keep_rows else None # data rows of the selected warehouses (for `write_reports_by_warehouse`)
+        self.errors = [] # data errors found by the last `report`
+        self.lock = threading.Lock()
+
+    def append(self, row):
+        """
+        Add one data row (po, carrier, status, warehouse, ship status, items)
+        An order made of several combos (or of combos and loose items) is split into one entry per combo and per loose item
+        """
+
+        po, carrier, status, warehouse, ship_status, items = row
+
+        if warehouse not in self.warehouses:
+            return
+
+        with self.lock:
+            if self.rows is not None:
+                self.rows.append(row)
+
+            for group in self.combo_index.split(items):
+                self.add_group(group, po, carrier, warehouse, ship_status)
+
+    def add_group(self, items, po, carrier, warehouse, ship_status):
+        """
+        Add the items of one entry of an order
+        """
+
+        table = self.table
+        start = len(table)
+        entry = Entry(table)
 
         for num, qty in items:
-            item = Item()
+            entry.add_item(num, qty, ship_status, po, carrier, warehouse)
 
-            item.num = num
-            item.qty = qty
-            item.ship_status = ship_status
-            item.po = po
-            item.carrier = carrier
-            item.warehouse = warehouse
+        entry.compute_uid(self.combo_index)
 
-            entry.items.append(item)
+        if carrier in IGNORED_CARRIERS and (len(entry.indices) == 1 or entry.is_combo):
+            table.truncate(start)
+            return
 
-        entry.compute_uid(combo_lookup)
+        target = self.entries.get(entry.uid)
 
-        if carrier in IGNORED_CARRIERS and (len(entry.items) == 1 or entry.is_combo):
-            continue
+        if target is None:
+            target = self.entries[entry.uid] = entry
+
+        self.fold(target, entry.indices, start)
+
+    def extend(self, rows):
+        """
+        Add many data rows
+        """
+
+        for row in rows:
+            self.append(row)
+
+    def fold(self, target, indices, start):
+        """
+        Move the items at `indices` (all at or after `start`, the end of the table before they were added) into `target`,
+        adding the quantities of on time items to an already folded on time item with the same number
+        """
+
+        table = self.table
+        kept = []
+
+        for i in indices:
+            if table.ship_status(i) != "Late":
+                folded = self.on_time.get((target.uid, table.nums[i]))
+
+                if folded is not None and folded < start:
+                    table.qtys[folded] = int(table.qtys[folded]) + int(table.qtys[i])
+                    continue
+
+            kept.append(table.row(i))
+
+        table.truncate(start)
+
+        if target.indices is indices:
+            target.indices = []
+
+        for row in kept:
+            i = table.add(*row)
+            target.indices.append(i)
+
+            if table.ship_status(i) != "Late":
+                self.on_time.setdefault((target.uid, table.nums[i]), i)
+
+    def compute_qtys(self):
+        """
+        Compute the total and late quantities of every entry at once with grouped sums over the item table
+        (combos count whole sets of their pieces)
+        Returns a description of every combo whose pieces don't add up to the same number of sets (counted as the smallest)
+        """
+
+        entries = list(self.entries.values())
+        table = self.table
+        errors = []
+
+        if not entries:
+            return errors
+
+        lengths = [len(entry.indices) for entry in entries]
+        rows = np.fromiter(itertools.chain.from_iterable(entry.indices for entry in entries), dtype=np.int64, count=sum(lengths))
+        owners = np.repeat(np.arange(len(entries)), lengths)
+        qtys = np.array([int(table.qtys[i]) for i in rows.tolist()], dtype=np.int64)
+        late = np.frombuffer(table.ship_statuses, dtype=np.uint32)[rows] == table.codes.get("Late", -1)
+
+        totals = np.bincount(owners, weights=qtys, minlength=len(entries)).astype(np.int64)
+        lates = np.bincount(owners, weights=qtys * late, minlength=len(entries)).astype(np.int64)
+
+        is_combo = np.array([entry.is_combo for entry in entries], dtype=bool)
+        combo_rows = is_combo[owners]
+
+        if combo_rows.any():
+            # sum the quantities of every (entry, piece) pair, then count how many sets of the combo each piece makes
+            num_codes, num_index = np.unique(np.frombuffer(table.nums, dtype=np.uint32)[rows[combo_rows]], return_inverse=True)
+            piece_names = {}
+            num_pieces = np.array([piece_names.setdefault(parse_sku(table.strings[code]).prefix, len(piece_names)) for code in num_codes.tolist()])
+            pieces = list(piece_names)
+
+            keys = owners[combo_rows] * len(pieces) + num_pieces[num_index]
+            groups, group_index = np.unique(keys, return_inverse=True)
+            group_owners = groups // len(pieces)
+            group_totals = np.bincount(group_index, weights=qtys[combo_rows]).astype(np.int64)
+            group_lates = np.bincount(group_index, weights=(qtys * late)[combo_rows]).astype(np.int64)
+            group_has_late = np.bincount(group_index, weights=late[combo_rows]) > 0
+
+            combos = {}
+            required = np.array([
+                combos.setdefault(owner, self.combo_lookup[strip_color(entries[owner].uid)]).get(pieces[piece], 0)
+                for owner, piece in zip(group_owners.tolist(), (groups % len(pieces)).tolist())
+            ], dtype=np.int64)
+
+            for group in np.flatnonzero(required == 0).tolist():
+                errors.append(f"{entries[group_owners[group]].uid}: {pieces[groups[group] % len(pieces)]} is not a piece of the combo")
+
+            required[required == 0] = 1
+            group_total_sets = group_totals // required
+            group_late_sets = group_lates // required
+
+            # groups are sorted by entry, so every combo entry is a contiguous run of groups
+            starts = np.flatnonzero(np.r_[True, group_owners[1:] != group_owners[:-1]])
+            combo_owners = group_owners[starts]
+            total_min = np.minimum.reduceat(group_total_sets, starts)
+            total_max = np.maximum.reduceat(group_total_sets, starts)
+
+            # late sets only count the pieces that have late items
+            late_min = np.minimum.reduceat(np.where(group_has_late, group_late_sets, np.iinfo(np.int64).max), starts)
+            late_max = np.maximum.reduceat(np.where(group_has_late, group_late_sets, -1), starts)
+            late_min[late_max < 0] = 0
+
+            totals[combo_owners] = total_min
+            lates[combo_owners] = late_min
+
+            for owner, low, high in zip(combo_owners.tolist(), total_min.tolist(), total_max.tolist()):
+                if low != high:
+                    errors.append(f"{entries[owner].uid}: pieces make between {low} and {high} combos (counted as {low})")
+
+            for owner, low, high in zip(combo_owners.tolist(), late_min.tolist(), late_max.tolist()):
+                if high >= 0 and low != high:
+                    errors.append(f"{entries[owner].uid}: late pieces make between {low} and {high} combos (counted as {low})")
+
+        for entry, total_qty, late_qty in zip(entries, totals.tolist(), lates.tolist()):
+            entry.total_qty = total_qty
+            entry.late_qty = late_qty
+
+        return errors
+
+    def report(self):
+        """
+        Returns the output data for every row added so far (data errors found on the way are kept in `errors`)
+        """
+
+        output_data = []
+
+        with self.lock:
+            self.errors = self.compute_qtys()
+
+            for entry in self.entries.values():
+                entry.write_to(output_data, self.class_lookup, self.combo_lookup)
+
+        return output_data
+
+
+class SourceFeed(object):
+    """
+    The rows of one source of an `OrderedFeeds` (anything scraped into it is added through `append`)
+    """
+
+    def __init__(self, feeds, source):
+        self.feeds = feeds
+        self.source = source
+
+    def append(self, row):
+        self.feeds.append(self.source, row)
+
+
+class OrderedFeeds(object):
+    """
+    Adds the rows of several concurrent sources (ex: sites) to a `ReportBuilder` as if the sources were added one after the other,
+    so the report doesn't depend on which source is faster
+    Rows of the first unfinished source go straight in, the others are buffered until every source before theirs is finished
+    """
+
+    def __init__(self, builder, count):
+        self.builder = builder
+        self.buffers = [[] for _ in range(count)]
+        self.finished = [False] * count
+        self.current = 0
+        self.lock = threading.Lock()
 
-        if entry.uid in entries:
-            entries[entry.uid].add_entry(entry)
-        else:
-            entries[entry.uid] = entry
+    def feed(self, source):
+        """
+        Returns the feed of a source (by index)
+        """
+
+        return SourceFeed(self, source)
+
+    def append(self, source, row):
+        with self.lock:
+            if source == self.current:
+                self.builder.append(row)
+            else:
+                self.buffers[source].append(row)
+
+    def finish(self, source):
+        """
+        Mark a source as finished, adding the buffered rows of the sources after it that can now go in
+        """
+
+        with self.lock:
+            self.finished[source] = True
+
+            while self.current < len(self.finished) and self.finished[self.current]:
+                self.current += 1
+
+                if self.current < len(self.buffers):
+                    self.builder.extend(self.buffers[self.current])
+                    self.buffers[self.current] = []
+
+    def flush(self):
+        """
+        Add every buffered row (in source order) without waiting for the sources before them (ex: for a partial report)
+        """
 
-    output_data = []
+        with self.lock:
+            for source, rows in enumerate(self.buffers):
+                self.builder.extend(rows)
+                self.buffers[source] = []
 
-    for entry in entries.values():
-        entry.write_to(output_data, class_lookup, combo_lookup)
+
+def parse_data(data, warehouses, class_lookup, combo_lookup, errors=None):
+    """
+    Parse data extracted from a sheet
+    Data errors (ex: combos with missing pieces) are described in `errors` (a list) if given
+    """
+
+    builder = ReportBuilder(warehouses, class_lookup, combo_lookup)
+    builder.extend(data)
+    output_data = builder.report()
+
+    if errors is not None:
+        errors.extend(builder.errors)
 
     return output_data
 
 
-def write_data(output_data, path):
+def partition_by_warehouse(data, warehouses):
+    """
+    Split data rows by warehouse in a single pass (rows of other warehouses are dropped)
+    Returns the rows by warehouse and all the kept rows in their original order
+    """
+
+    partitions = {warehouse: [] for warehouse in warehouses}
+    kept = []
+
+    for row in data:
+        partition = partitions.get(row[3])
+
+        if partition is not None:
+            partition.append(row)
+            kept.append(row)
+
+    return partitions, kept
+
+
+def warehouse_path(path, warehouse):
+    """
+    Path of a warehouse's own report (ex: output.xlsx -> output_NY.xlsx)
+    """
+
+    root, ext = os.path.splitext(path)
+    return f"{root}_{warehouse}{ext}"
+
+
+def build_and_write_report(data, warehouses, class_lookup, combo_lookup, path, streaming=False, output_data=None):
+    """
+    Group `data` and write the report to `path` (runs in a worker process, so it only takes picklable arguments)
+    An already grouped `output_data` is written as is
+    Returns the path and the data errors found
+    """
+
+    errors = []
+
+    if output_data is None:
+        output_data = parse_data(data, warehouses, class_lookup, combo_lookup, errors)
+
+    write_report(output_data, path, streaming)
+
+    return path, errors
+
+
+def write_reports_by_warehouse(data, warehouses, class_lookup, combo_lookup, path, streaming=False, combined=None, errors=None):
+    """
+    Write the combined report to `path` and every warehouse's own report next to it, each one built in its own process
+    The data is partitioned once, `combined` is the combined report's output data if it is already grouped
+    Data errors found building the combined report are described in `errors` (a list) if given
+    Returns the paths written by warehouse (None for the combined report)
+    """
+
+    partitions, kept = partition_by_warehouse(data, warehouses)
+    jobs = {None: (kept if combined is None else [], warehouses, path, combined)}
+
+    for warehouse, rows in partitions.items():
+        jobs[warehouse] = (rows, [warehouse], warehouse_path(path, warehouse), None)
+
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+        futures = {
+            key: executor.submit(build_and_write_report, rows, job_warehouses, class_lookup, combo_lookup, job_path, streaming, output_data)
+            for key, (rows, job_warehouses, job_path, output_data) in jobs.items()
+        }
+
+        results = {key: future.result() for key, future in futures.items()}
+
+    if errors is not None:
+        errors.extend(results[None][1])
+
+    return {key: result_path for key, (result_path, _) in results.items()}
+
+
+def output_rows(item):
+    """
+    Lays out one output entry as rows of cell values (shorter columns are padded with "")
+    """
+
+    height = max(len(data) for data in item["data"])
+
+    for offset in range(height):
+        yield [data[offset] if offset < len(data) else "" for data in item["data"]]
+
+
+def write_data(output_data, path, streaming=False):
     """
     Write data to an output sheet
+    With `streaming` the sheet is written row by row in openpyxl's write only mode (for very large reports)
     """
 
+    if streaming:
+        write_data_streaming(output_data, path)
+        return
+
     output_wb = openpyxl.Workbook()
     output_sheet = output_wb.active
+    alignment = openpyxl.styles.Alignment(vertical="center")
 
-    column_headers = [
-        "Class",
-        "Item",
-        "Total Qty",
-        "Late Qty",
-        "Late Qtys",
-        "PO",
-        "Carrier",
-        "Warehouse",
-    ]
-
-    for i, column in enumerate(column_headers):
+    for i, column in enumerate(COLUMN_HEADERS):
         output_sheet.cell(1, i + 1).value = column
 
     row_ptr = 2
@@ -417,40 +1185,231 @@ def write_data(output_data, path):
     for item in output_data:
         start_row = row_ptr
 
-        for offset in itertools.count():
-            written = False
+        for row in output_rows(item):
+            for col, value in enumerate(row):
+                output_sheet.cell(row_ptr, col + 1).value = value
 
-            for col, data in enumerate(item["data"]):
-                value = ""
-
-                if offset < len(data):
-                    value = data[offset]
-                    written = True
-
-                output_sheet.cell(row_ptr + offset, col + 1).value = value
-
-            if not written:
-                break
-
-        row_ptr += offset
+            row_ptr += 1
 
         if row_ptr - start_row > 1:
             for col in item["merge"]:
                 output_sheet.merge_cells(start_row=start_row, end_row=row_ptr - 1, start_column=col, end_column=col)
                 for row in range(start_row, row_ptr):
-                    output_sheet.cell(row, col).alignment = openpyxl.styles.Alignment(vertical="center")
+                    output_sheet.cell(row, col).alignment = alignment
 
     output_wb.save(path)
 
 
+def write_data_streaming(output_data, path):
+    """
+    Write data to an output sheet one row at a time, keeping only the current row in memory
+    """
+
+    output_wb = openpyxl.Workbook(write_only=True)
+    output_sheet = output_wb.create_sheet()
+    output_sheet.append(COLUMN_HEADERS)
+
+    alignment = openpyxl.styles.Alignment(vertical="center") # shared by every merged cell
+    row_ptr = 2
+
+    for item in output_data:
+        rows = list(output_rows(item))
+        merge = item["merge"] if len(rows) > 1 else []
+
+        for offset, row in enumerate(rows):
+            for col in merge:
+                cell = WriteOnlyCell(output_sheet, row[col - 1] if offset == 0 else None)
+                cell.alignment = alignment
+                row[col - 1] = cell
+
+            output_sheet.append(row)
+
+        for col in merge:
+            letter = get_column_letter(col)
+            output_sheet.merged_cells.add(f"{letter}{row_ptr}:{letter}{row_ptr + len(rows) - 1}")
+
+        row_ptr += len(rows)
+
+    output_wb.save(path)
+
+
+def write_csv(output_data, path):
+    """
+    Write data to a csv file (same layout as the output sheet, merged columns only on an entry's first row)
+    """
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMN_HEADERS)
+
+        for item in output_data:
+            for offset, row in enumerate(output_rows(item)):
+                if offset > 0:
+                    for col in item["merge"]:
+                        row[col - 1] = ""
+
+                writer.writerow(row)
+
+
+def write_jsonl(output_data, path):
+    """
+    Write data as json lines (one object per entry, merged columns as single values and the rest as lists)
+    """
+
+    with open(path, "w", encoding="utf-8") as f:
+        for item in output_data:
+            record = {}
+
+            for col, (header, data) in enumerate(zip(COLUMN_HEADERS, item["data"])):
+                record[header] = data[0] if col + 1 in item["merge"] else data
+
+            f.write(dumps(record, default=str) + "\n")
+
+
+def write_report(output_data, path, streaming=False):
+    """
+    Write data in the format matching the extension of `path` (.xlsx, .csv or .jsonl)
+    """
+
+    if path.endswith(".csv"):
+        write_csv(output_data, path)
+    elif path.endswith(".jsonl"):
+        write_jsonl(output_data, path)
+    else:
+        write_data(output_data, path, streaming)
+
+
+DELTA_HEADERS = ["Change", "Item", "PO", "Before", "After"]
+
+
+def report_state(output_data):
+    """
+    Summarizes a report for comparing it with the next run: item -> class, total and late quantities and late qty by PO
+    """
+
+    state = {}
+
+    for item in output_data:
+        class_name, item_num, total_qty, late_qty, late_qtys, pos = item["data"][:6]
+        late_pos = {}
+
+        for po, qty in zip(pos, late_qtys):
+            late_pos[str(po)] = late_pos.get(str(po), 0) + int(qty)
+
+        state[item_num[0]] = {"class": class_name[0], "total": total_qty[0], "late": late_qty[0], "late_pos": late_pos}
+
+    return state
+
+
+def load_report_state(path):
+    """
+    Loads the state saved by the previous run (empty if there is none)
+    """
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_report_state(state, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def diff_report_states(previous, current):
+    """
+    Returns the changes between two report states as rows of `DELTA_HEADERS`:
+    POs that became late, POs that were cleared (shipped or no longer late) and changed total/late quantities
+    Only the items whose state differs are compared in detail
+    """
+
+    changes = []
+    empty = {"total": 0, "late": 0, "late_pos": {}}
+
+    for item_num in list(current) + [item_num for item_num in previous if item_num not in current]:
+        before = previous.get(item_num, empty)
+        after = current.get(item_num, empty)
+
+        if before == after:
+            continue
+
+        for po, qty in after["late_pos"].items():
+            if po not in before["late_pos"]:
+                changes.append(["New late", item_num, po, "", qty])
+            elif before["late_pos"][po] != qty:
+                changes.append(["Late qty", item_num, po, before["late_pos"][po], qty])
+
+        for po, qty in before["late_pos"].items():
+            if po not in after["late_pos"]:
+                changes.append(["Cleared", item_num, po, qty, ""])
+
+        for key, name in (("total", "Total qty"), ("late", "Late qty")):
+            if before[key] != after[key]:
+                changes.append([name, item_num, "", before[key], after[key]])
+
+    return changes
+
+
+def write_delta(changes, path):
+    """
+    Write the changes from `diff_report_states` in the format matching the extension of `path` (.xlsx, .csv or .jsonl)
+    """
+
+    if path.endswith(".jsonl"):
+        with open(path, "w", encoding="utf-8") as f:
+            for change in changes:
+                f.write(dumps(dict(zip(DELTA_HEADERS, change)), default=str) + "\n")
+    elif path.endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(DELTA_HEADERS)
+            writer.writerows(changes)
+    else:
+        output_wb = openpyxl.Workbook(write_only=True)
+        output_sheet = output_wb.create_sheet()
+        output_sheet.append(DELTA_HEADERS)
+
+        for change in changes:
+            output_sheet.append(change)
+
+        output_wb.save(path)
+
+
+def load_lookups(class_path="class_lookup.xlsx", combo_path="combo_lookup.xlsx"):
+    """
+    Loads the (cached) class and combo lookups, printing a warning for every malformed row
+    """
+
+    errors = []
+    class_lookup = load_cached_lookup(class_path, load_class_lookup, errors)
+    combo_lookup = load_cached_lookup(combo_path, load_combo_lookup, errors)
+
+    for error in errors:
+        print(f"Skipped {error}")
+
+    return class_lookup, combo_lookup
+
+
 def main():
-    data_sheet = openpyxl.load_workbook("report.xlsx").active
-    class_lookup = load_class_lookup("class_lookup.xlsx")
-    combo_lookup = load_combo_lookup("combo_lookup.xlsx")
+    class_lookup, combo_lookup = load_lookups()
     warehouses = input_warehouses()
-    output_data = parse_data(get_data(data_sheet), warehouses, class_lookup, combo_lookup)
 
-    write_data(output_data, "output.xlsx")
+    # 'snapshot=PATH' re-parses a snapshot saved by the scraper instead of report.xlsx
+    snapshot_path = next((opt.partition("=")[2] for opt in sys.argv[1:] if opt.startswith("snapshot=")), "")
+    data = get_snapshot_data(snapshot_path) if snapshot_path else get_data("report.xlsx")
+
+    # 'by_warehouse' also writes a report per warehouse (output_NY.xlsx, ...)
+    errors = []
+
+    if "by_warehouse" in sys.argv[1:]:
+        write_reports_by_warehouse(data, warehouses, class_lookup, combo_lookup, "output.xlsx", errors=errors)
+    else:
+        write_data(parse_data(data, warehouses, class_lookup, combo_lookup, errors), "output.xlsx")
+
+    for error in errors:
+        print(f"Data error: {error}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""
+Module for saving scraped orders as a columnar snapshot (a directory of .npy columns) that can be memory mapped back
+
+ex: scraped_2022-08-01.snapshot/
+        meta.json         version, date of the scrape and the strings the code columns refer to
+        order_time.npy    datetime64[s] (NaT when unknown)
+        site.npy, po.npy, carrier.npy, status.npy, warehouse.npy    uint32 string codes
+        item_start.npy    int64 offset of every order's first item (plus the total item count at the end)
+        item_num.npy      uint32 string codes
+        item_qty.npy      int64
+"""
+
+import os
+import json
+import threading
+from array import array
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+ORDER_COLUMNS = ["site", "po", "carrier", "status", "warehouse"]
+
+
+class SnapshotWriter(object):
+    """
+    Collects orders (as returned by `orders.build_order`) column by column, with the nested items flattened
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.strings = []
+        self.string_codes = {}
+        self.order_times = []
+        self.columns = {name: array("I") for name in ORDER_COLUMNS}
+        self.item_start = array("q", [0])
+        self.item_nums = array("I")
+        self.item_qtys = array("q")
+
+    def __len__(self):
+        return len(self.order_times)
+
+    def code(self, value):
+        """
+        Returns the code of a string (or None), adding it to the strings if it's new
+        """
+
+        code = self.string_codes.get(value)
+
+        if code is None:
+            code = self.string_codes[value] = len(self.strings)
+            self.strings.append(value)
+
+        return code
+
+    def extend(self, site, orders):
+        """
+        Add the orders of a site
+        """
+
+        with self.lock:
+            for order_time, po, carrier, status, warehouse, items in orders:
+                self.order_times.append(order_time)
+
+                for name, value in zip(ORDER_COLUMNS, (site, po, carrier, status, warehouse)):
+                    self.columns[name].append(self.code(value))
+
+                for num, qty in items:
+                    self.item_nums.append(self.code(num))
+                    self.item_qtys.append(int(qty))
+
+                self.item_start.append(len(self.item_nums))
+
+    def save(self, path, as_of):
+        """
+        Write the snapshot to the directory `path` (the metadata is written last, so a snapshot without it is incomplete)
+        """
+
+        os.makedirs(path, exist_ok=True)
+
+        with self.lock:
+            columns = {
+                "order_time": np.array(self.order_times, dtype="datetime64[s]"),
+                **{name: np.frombuffer(column, dtype=np.uint32) for name, column in self.columns.items()},
+                "item_start": np.frombuffer(self.item_start, dtype=np.int64),
+                "item_num": np.frombuffer(self.item_nums, dtype=np.uint32),
+                "item_qty": np.frombuffer(self.item_qtys, dtype=np.int64),
+            }
+
+            for name, column in columns.items():
+                np.save(os.path.join(path, f"{name}.npy"), column)
+
+            meta = {"version": SNAPSHOT_VERSION, "as_of": str(as_of), "orders": len(self.order_times), "strings": self.strings}
+
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+
+def load(path):
+    """
+    Memory map a snapshot, returning its metadata and columns (by name)
+    """
+
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"{path} is not a complete snapshot")
+
+    if meta["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is a version {meta['version']} snapshot (expected {SNAPSHOT_VERSION})")
+
+    names = ["order_time", *ORDER_COLUMNS, "item_start", "item_num", "item_qty"]
+    columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
+
+    return meta, columns
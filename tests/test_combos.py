@@ -0,0 +1,240 @@
+import random
+import bench
+import sheets
+
+COMBO_LOOKUP = {
+    "VA3036-60": {"VA3036": 1, "VA3024": 1},
+    "VA3036-60W": {"VA3036": 1, "VA3024": 1},
+    "VA3048-72": {"VA3048": 2, "VA3024": 2},
+    "VA3048-72W": {"VA3048": 2, "VA3024": 2},
+}
+
+
+def report(rows, warehouses=("NY",)):
+    """
+    Group rows and return {item: (total qty, late qty)}
+    """
+
+    output_data = sheets.parse_data(rows, list(warehouses), {}, COMBO_LOOKUP)
+    return {item["data"][1][0].split(":")[0]: (item["data"][2][0], item["data"][3][0]) for item in output_data}
+
+
+def row(items, carrier="Freight", ship_status="Late", po="PO1"):
+    return (po, carrier, "Not Shipped", "NY", ship_status, items)
+
+
+def test_resolve_exact_combo():
+    index = sheets.ComboIndex(COMBO_LOOKUP)
+
+    assert index.resolve([("VA3036-W", 1), ("VA3024-W", 1)]) == "VA3036-60W"
+    assert index.resolve([("VA3036", "1"), ("VA3024", "1")]) == "VA3036-60"
+
+
+def test_resolve_multiples():
+    index = sheets.ComboIndex(COMBO_LOOKUP)
+
+    assert index.resolve([("VA3036-W", 3), ("VA3024-W", 3)]) == "VA3036-60W"
+    assert index.resolve([("VA3048-W", 2), ("VA3024-W", 2)]) == "VA3048-72W"
+    assert index.resolve([("VA3048-W", 4), ("VA3024-W", 4)]) == "VA3048-72W"
+
+
+def test_resolve_not_a_combo():
+    index = sheets.ComboIndex(COMBO_LOOKUP)
+
+    assert index.resolve([("VA3036-W", 1), ("VA3024-G", 1)]) is None # mixed colors
+    assert index.resolve([("VA3036-W", 2), ("VA3024-W", 1)]) is None
+    assert index.resolve([("VA3048-W", 1), ("VA3024-W", 1)]) is None # half of a combo of 2 of each
+    assert index.resolve([("VA3036-W", 1)]) is None
+
+
+def test_split_several_combos():
+    index = sheets.ComboIndex(COMBO_LOOKUP)
+    groups = index.split([("VA3036-W", 1), ("VA3024-W", 3), ("VA3048-W", 2)])
+
+    assert sorted(map(sorted, groups)) == [
+        [("VA3024-W", 1), ("VA3036-W", 1)],
+        [("VA3024-W", 2), ("VA3048-W", 2)],
+    ]
+
+
+def test_split_combo_and_loose_item():
+    index = sheets.ComboIndex(COMBO_LOOKUP)
+    groups = index.split([("VA3036-W", "2"), ("VA3024-W", "1"), ("AB12", "1")])
+
+    assert groups == [[("VA3036-W", "1"), ("VA3024-W", "1")], [("VA3036-W", "1")], [("AB12", "1")]]
+
+
+def test_split_keeps_orders_without_combos():
+    index = sheets.ComboIndex(COMBO_LOOKUP)
+    items = [("VA3036-W", 1), ("AB12", 1)]
+
+    assert index.split(items) == [items]
+    assert index.split([("VA3036-W", 2), ("VA3024-W", 2)]) == [[("VA3036-W", 2), ("VA3024-W", 2)]]
+
+
+def test_report_counts_combos():
+    assert report([
+        row([("VA3048-W", 2), ("VA3024-W", 2)]),
+        row([("VA3036-W", 2), ("VA3024-W", 2)], ship_status="On Time", po="PO2"),
+    ]) == {"VA3048-72W": (1, 1), "VA3036-60W": (2, 0)}
+
+
+def test_report_splits_orders():
+    assert report([row([("VA3036-W", 1), ("VA3024-W", 3), ("VA3048-W", 2), ("AB12", 1)])]) == {
+        "VA3036-60W": (1, 1),
+        "VA3048-72W": (1, 1),
+        "AB12": (1, 1),
+    }
+
+
+def test_ignored_carriers_drop_combos_and_single_items():
+    # combos and single items shipped by an ignored carrier are left out, also when they were split out of a bigger order
+    assert report([
+        row([("VA3036-W", 1), ("VA3024-W", 1)], carrier="Fedex"),
+        row([("AB12", 1)], carrier="Ups", po="PO2"),
+        row([("VA3036-W", 1), ("VA3024-W", 1), ("AB12", 2)], carrier="Fedex", po="PO3"),
+        row([("VA3036-W", 1), ("VA3024-W", 1)], po="PO4"),
+    ]) == {"VA3036-60W": (1, 1)}
+
+
+def test_ignored_carriers_keep_special_orders():
+    output_data = sheets.parse_data([row([("VA3036-W", 1), ("AB12", 1)], carrier="Fedex")], ["NY"], {}, COMBO_LOOKUP)
+
+    assert len(output_data) == 1
+    assert output_data[0]["data"][1][0].startswith("SPECIAL ORDER")
+
+
+def test_ordered_feeds_match_sequential_sites():
+    site1 = [row([("AB12", 1)], po="PO1"), row([("CD34", 1)], po="PO2")]
+    site2 = [row([("CD34", 2)], po="PO3"), row([("AB12", 3)], po="PO4")]
+    expected = sheets.parse_data(site1 + site2, ["NY"], {}, COMBO_LOOKUP)
+
+    # the second site finishes first
+    builder = sheets.ReportBuilder(["NY"], {}, COMBO_LOOKUP)
+    feeds = sheets.OrderedFeeds(builder, 2)
+    for data in site2:
+        feeds.feed(1).append(data)
+    feeds.finish(1)
+    feeds.feed(0).append(site1[0])
+    feeds.feed(0).append(site1[1])
+    feeds.finish(0)
+
+    assert builder.report() == expected
+
+
+def builder_report(rows, combo_lookup):
+    """
+    Group rows, then compute the report with a different combo lookup (ex: a lookup sheet that disagrees with the resolved combos)
+    Returns the builder's errors and {item: (total qty, late qty)}
+    """
+
+    builder = sheets.ReportBuilder(["NY"], {}, COMBO_LOOKUP)
+    builder.extend(rows)
+    builder.combo_lookup = combo_lookup
+    output_data = builder.report()
+
+    return builder.errors, {item["data"][1][0].split(":")[0]: (item["data"][2][0], item["data"][3][0]) for item in output_data}
+
+
+def reference_qtys(builder):
+    """
+    The total and late quantities of every entry, summed one item at a time
+    """
+
+    table = builder.table
+    qtys = {}
+
+    for uid, entry in builder.entries.items():
+        items = [(table.num(i), int(table.qtys[i]), table.ship_status(i) == "Late") for i in entry.indices]
+
+        if not entry.is_combo:
+            qtys[uid] = (sum(qty for _, qty, _ in items), sum(qty for _, qty, late in items if late))
+            continue
+
+        pieces = builder.combo_lookup[sheets.strip_color(uid)]
+        totals = {}
+        lates = {}
+
+        for num, qty, late in items:
+            piece = sheets.parse_sku(num).prefix
+            totals[piece] = totals.get(piece, 0) + qty
+
+            if late:
+                lates[piece] = lates.get(piece, 0) + qty
+
+        qtys[uid] = (
+            min(qty // pieces[piece] for piece, qty in totals.items()),
+            min((qty // pieces[piece] for piece, qty in lates.items()), default=0),
+        )
+
+    return qtys
+
+
+def test_compute_qtys_matches_item_sums():
+    rng = random.Random(0)
+    combo_lookup = {combo + color: pieces for combo, pieces in bench.combos() for color in [""] + bench.COLORS}
+    rows = [
+        (f"PO{i}", rng.choice(bench.CARRIERS), "Not Shipped", "NY", rng.choice(["Late", "On Time"]), bench.random_items(rng))
+        for i in range(2000)
+    ]
+    builder = sheets.ReportBuilder(["NY"], {}, combo_lookup)
+    builder.extend(rows)
+
+    assert builder.compute_qtys() == []
+    assert {uid: (entry.total_qty, entry.late_qty) for uid, entry in builder.entries.items()} == reference_qtys(builder)
+
+
+def test_report_mixed_late_and_on_time_combos():
+    assert report([
+        row([("VA3036-W", 2), ("VA3024-W", 2)]),
+        row([("VA3036-W", "1"), ("VA3024-W", "1")], ship_status="On Time", po="PO2"),
+        row([("VA3048-W", 2), ("VA3024-W", 2)], ship_status="On Time", po="PO3"),
+        row([("VA3048-W", 4), ("VA3024-W", 4)], ship_status="On Time", po="PO4"),
+    ]) == {"VA3036-60W": (3, 2), "VA3048-72W": (3, 0)}
+
+
+def test_report_sums_string_quantities():
+    assert report([
+        row([("AB12", "2")]),
+        row([("AB12", "3")], ship_status="On Time", po="PO2"),
+        row([("AB12", "1")], ship_status="On Time", po="PO3"),
+    ]) == {"AB12": (6, 2)}
+
+
+def test_inconsistent_piece_counts():
+    # the lookup now needs 2 of one piece, so the pieces don't add up to the same number of sets
+    errors, qtys = builder_report(
+        [row([("VA3036-W", 2), ("VA3024-W", 2)]), row([("VA3036-W", "1"), ("VA3024-W", "1")], ship_status="On Time", po="PO2")],
+        dict(COMBO_LOOKUP, **{"VA3036-60": {"VA3036": 1, "VA3024": 2}}),
+    )
+
+    assert errors == [
+        "VA3036-60W: pieces make between 1 and 3 combos (counted as 1)",
+        "VA3036-60W: late pieces make between 1 and 2 combos (counted as 1)",
+    ]
+    assert qtys == {"VA3036-60W": (1, 1)}
+
+
+def test_late_sets_only_count_late_pieces():
+    # only the late pieces bound the late sets, the on time ones only the total
+    errors, qtys = builder_report(
+        [row([("VA3036-W", 1), ("VA3024-W", 1)]), row([("VA3036-W", 1), ("VA3024-W", 1)], ship_status="On Time", po="PO2")],
+        dict(COMBO_LOOKUP, **{"VA3036-60": {"VA3036": 1, "VA3024": 2}}),
+    )
+
+    assert errors == [
+        "VA3036-60W: pieces make between 1 and 2 combos (counted as 1)",
+        "VA3036-60W: late pieces make between 0 and 1 combos (counted as 0)",
+    ]
+    assert qtys == {"VA3036-60W": (1, 0)}
+
+
+def test_piece_not_in_combo():
+    errors, qtys = builder_report(
+        [row([("VA3036-W", 2), ("VA3024-W", 2)]), row([("VA3036-W", 1), ("VA3024-W", 1)], ship_status="On Time", po="PO2")],
+        dict(COMBO_LOOKUP, **{"VA3036-60": {"VA3036": 1, "VA3030": 1}}),
+    )
+
+    # the unknown piece counts as 1 per set
+    assert errors == ["VA3036-60W: VA3024 is not a piece of the combo"]
+    assert qtys == {"VA3036-60W": (3, 2)}
@@ -0,0 +1,54 @@
+import os
+import stat
+import time
+import pytest
+import cookie_store
+
+COOKIES = [{"name": "session", "value": "secret", "domain": "example.com", "path": "/"}]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "cookies.json")
+    cookie_store.CookieStore(path).put("site", COOKIES + [{"name": "old", "value": "1", "expiry": time.time() - 1}])
+
+    assert cookie_store.CookieStore(path).get("site") == COOKIES
+    assert cookie_store.CookieStore(path).get("other") == []
+
+
+@pytest.mark.skipif(os.name == "nt", reason="posix permissions")
+def test_owner_only(tmp_path):
+    path = str(tmp_path / "cookies.json")
+    cookie_store.CookieStore(path).put("site", COOKIES)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_saved_protected(tmp_path, monkeypatch):
+    monkeypatch.setattr(cookie_store, "protect", lambda data: data[::-1])
+    monkeypatch.setattr(cookie_store, "unprotect", lambda data: data[::-1])
+    path = str(tmp_path / "cookies.json")
+    cookie_store.CookieStore(path).put("site", COOKIES)
+
+    with open(path, "rb") as f:
+        assert b"secret" not in f.read()
+
+    assert cookie_store.CookieStore(path).get("site") == COOKIES
+
+
+def test_unreadable_file_costs_a_login(tmp_path, monkeypatch):
+    def unprotect(data):
+        raise OSError("The data is invalid")
+
+    path = str(tmp_path / "cookies.json")
+    cookie_store.CookieStore(path).put("site", COOKIES)
+    monkeypatch.setattr(cookie_store, "unprotect", unprotect)
+
+    assert cookie_store.CookieStore(path).get("site") == []
+
+
+@pytest.mark.skipif(os.name != "nt", reason="DPAPI is Windows only")
+def test_dpapi_round_trip():
+    encrypted = cookie_store.protect(b"secret")
+
+    assert encrypted != b"secret"
+    assert cookie_store.unprotect(encrypted) == b"secret"
@@ -0,0 +1,80 @@
+from datetime import datetime
+import pytest
+import orders
+
+TABLE = "<table><thead><tr><th>a</th></tr></thead><tbody><tr><td>x</td></tr></tbody></table>"
+DETAILS = "<table><thead><tr><th>Ship</th><th>WH</th><th>Tracking #</th></tr></thead><tbody><tr><td>x<td> CA </td><td>123 [Fedex] </td></tr></tbody></table>"
+ITEMS = """<table><thead><tr><th>Item Name</th><th>Quanity</th></tr></thead><tbody>
+<tr><td>VA3036-W</td><td>1</td></tr>
+<tr><td>VA3024-W</td><td>2</td></tr>
+<tr></tr>
+</tbody></table>"""
+
+
+def page(*tables, warehouse='<b style="color: green">NY 1</b>'):
+    return f"""<html><body>
+<div><strong>Order Date</strong> - 01/05/2022<br><strong>PO #</strong> - PO555</div>
+{warehouse}
+{"".join(tables)}
+</body></html>"""
+
+
+def test_build_order():
+    order = orders.build_order(orders.extract_fields(page(TABLE, TABLE, DETAILS, ITEMS)))
+
+    assert order == (datetime(2022, 1, 5), "PO555", "Fedex", "Not Shipped", "NY", [("VA3036-W", "1"), ("VA3024-W", "2")])
+
+
+def test_warehouse_from_details():
+    order = orders.build_order(orders.extract_fields(page(TABLE, TABLE, DETAILS, ITEMS, warehouse="")))
+
+    assert order[4] == "CA"
+
+
+def test_table_without_tbody():
+    # browsers add the missing tbody, so the item table is still the 4th tbody
+    items = ITEMS.replace("<tbody>", "").replace("</tbody>", "")
+    order = orders.build_order(orders.extract_fields(page(TABLE, TABLE, DETAILS, items)))
+
+    assert order[5] == [("VA3036-W", "1"), ("VA3024-W", "2")]
+
+
+def test_rows_without_thead_or_tbody_are_counted():
+    root = orders.parse_page("<table><tr><td>a</td></tr><tr><td>b</td></tr></table><table><thead><tr><th>h</th></tr></thead></table>")
+
+    assert len(root.find_all("tbody")) == 1
+    assert len(root.find_all("tbody")[0].find_all("tr")) == 2
+    assert len(root.find_all("thead")[0].find_all("tr")) == 1
+
+
+def test_implicitly_closed_cells():
+    root = orders.parse_page("<table><tbody><tr><td>a<td>b<tr><td>c</tbody></table>")
+    rows = root.find_all("tr")
+
+    assert [[td.inner_text() for td in row.find_all("td")] for row in rows] == [["a", "b"], ["c"]]
+
+
+def test_missing_item_tables():
+    with pytest.raises(ValueError):
+        orders.extract_fields(page(TABLE, DETAILS))
+
+
+def test_no_items():
+    items = ITEMS.split("<tbody>")[0] + "<tbody><tr></tr></tbody></table>"
+
+    with pytest.raises(ValueError, match="no items"):
+        orders.build_order(orders.extract_fields(page(TABLE, TABLE, DETAILS, items)))
+
+
+def test_layout_errors_are_per_order_errors():
+    # a details table missing the tracking column
+    details = DETAILS.replace("<td>123 [Fedex] </td>", "")
+
+    with pytest.raises(orders.FETCH_ERRORS):
+        orders.build_order(orders.extract_fields(page(TABLE, TABLE, details, ITEMS, warehouse="")))
+
+
+def test_unknown_carrier():
+    order = orders.build_order(orders.extract_fields(page(TABLE, TABLE, DETAILS.replace("[Fedex]", ""), ITEMS)))
+
+    assert order[2] == "UNKWN"
@@ -0,0 +1,101 @@
+import re
+import zipfile
+from datetime import date, datetime
+import openpyxl
+import pytest
+import sheets
+import xlsx
+
+
+def trimmed(rows):
+    """
+    Rows without their trailing empty cells (the backends pad rows differently, `sheets.cell` reads both the same)
+    """
+
+    trimmed_rows = []
+
+    for row in rows:
+        row = list(row)
+
+        while row and row[-1] is None:
+            row.pop()
+
+        trimmed_rows.append(row)
+
+    return trimmed_rows
+
+
+def edit_sheet(path, edit):
+    """
+    Rewrite the xml of the first sheet of a workbook with `edit` (for cells openpyxl can't write)
+    """
+
+    with zipfile.ZipFile(path) as archive:
+        files = {name: archive.read(name) for name in archive.namelist()}
+
+    files["xl/worksheets/sheet1.xml"] = edit(files["xl/worksheets/sheet1.xml"].decode("utf-8")).encode("utf-8")
+
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+
+
+def set_cell(xml, ref, new_cell):
+    return re.sub(rf'<c r="{ref}"[^>]*?(/>|>.*?</c>)', new_cell, xml)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "book.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Order", "PO", "Qty", "Price", "Shipped", "Date"])
+    ws.append(["123", "PO1", 2, 1.5, True, datetime(2022, 1, 5, 10, 30)])
+    ws.append(["124", None, 10 ** 12, -3, False, date(2022, 2, 1)])
+    ws["A6"] = "after a gap"
+    ws["H6"] = "far column"
+    ws["A7"] = "=1+1"
+    ws["B7"] = "=A1"
+    ws["C7"] = "x"
+    ws["D7"] = "y"
+    ws["E7"] = "z"
+    wb.save(path)
+
+    return path
+
+
+def both_backends(path, min_row=1):
+    return trimmed(sheets.openpyxl_rows(path, min_row)), trimmed(xlsx.iter_rows(path, min_row))
+
+
+def test_same_rows(workbook):
+    openpyxl_rows, xml_rows = both_backends(workbook)
+
+    assert xml_rows == openpyxl_rows
+    assert xml_rows[3] == xml_rows[4] == [] # the gap
+    assert xml_rows[6][:2] == [None, None] # formulas without cached values
+    assert xml_rows[1] == ["123", "PO1", 2, 1.5, True, datetime(2022, 1, 5, 10, 30)]
+
+
+def test_same_rows_from_min_row(workbook):
+    openpyxl_rows, xml_rows = both_backends(workbook, 3)
+
+    assert xml_rows == openpyxl_rows
+
+
+def test_cells_openpyxl_reads_but_doesnt_write(workbook):
+    def edit(xml):
+        # formulas without cached values (as openpyxl saves them), iso dates, inline strings and booleans/errors as text
+        xml = set_cell(xml, "A7", '<c r="A7"><f>1+1</f><v/></c>')
+        xml = set_cell(xml, "B7", '<c r="B7" t="str"><f>A1</f><v>Order</v></c>')
+        xml = set_cell(xml, "C7", '<c r="C7" t="d"><v>2022-03-04T05:06:07</v></c>')
+        xml = set_cell(xml, "D7", '<c r="D7" t="inlineStr"><is><t>inline</t></is></c>')
+        xml = set_cell(xml, "E7", '<c r="E7" t="inlineStr"/>')
+        return xml.replace('<c r="A6"', '<c r="B6" t="d"><v>2022-03-04</v></c><c r="C6" t="e"><v>#N/A</v></c><c r="A6"', 1)
+
+    edit_sheet(workbook, edit)
+    openpyxl_rows, xml_rows = both_backends(workbook)
+
+    assert xml_rows == openpyxl_rows
+    assert xml_rows[5][:3] == ["after a gap", date(2022, 3, 4), "#N/A"]
+    assert xml_rows[6] == [None, "Order", datetime(2022, 3, 4, 5, 6, 7), "inline"]
@@ -0,0 +1,97 @@
+"""
+Module for timing the stages of a scrape
+"""
+
+import json
+import time
+import threading
+import numpy as np
+from contextlib import contextmanager
+
+
+class Timer(object):
+    """
+    Records named timing spans (optionally exporting each one as a json line) and summarizes them
+    """
+
+    def __init__(self, enabled=True, path=None):
+        self.enabled = enabled
+        self.spans = {} # name -> list of (start, seconds)
+        self.transferred = {} # name -> list of the "bytes" field of its spans
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8") if enabled and path else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @contextmanager
+    def span(self, name, **fields):
+        """
+        Time the body of a `with` block as a span called `name`
+        Yields a dict of the span's fields so the block can add to them (ex: bytes transferred)
+        """
+
+        if not self.enabled:
+            yield fields
+            return
+
+        start = time.time()
+        perf_start = time.perf_counter()
+
+        try:
+            yield fields
+        finally:
+            self.record(name, start, time.perf_counter() - perf_start, fields)
+
+    def record(self, name, start, seconds, fields=None):
+        """
+        Record a finished span
+        """
+
+        with self.lock:
+            self.spans.setdefault(name, []).append((start, seconds))
+
+            if fields and "bytes" in fields:
+                self.transferred.setdefault(name, []).append(fields["bytes"])
+
+            if self.file is not None:
+                self.file.write(json.dumps({"span": name, "start": start, "seconds": seconds, **(fields or {})}, default=str) + "\n")
+                self.file.flush()
+
+    def summary(self):
+        """
+        Returns a table of every span's count, total and percentiles (in seconds), plus bytes transferred and order throughput
+        """
+
+        lines = [f"{'span':<16}{'count':>8}{'total':>10}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+
+        with self.lock:
+            for name, spans in self.spans.items():
+                seconds = np.array([span[1] for span in spans])
+                p50, p90, p99 = np.percentile(seconds, [50, 90, 99])
+                lines.append(
+                    f"{name:<16}{len(seconds):>8}{seconds.sum():>10.2f}{seconds.mean():>9.3f}"
+                    f"{p50:>9.3f}{p90:>9.3f}{p99:>9.3f}{seconds.max():>9.3f}"
+                )
+
+            for name, transferred in self.transferred.items():
+                lines.append(f"{name} transferred: {sum(transferred) / 2 ** 20:.2f} MB ({sum(transferred) / len(transferred) / 2 ** 10:.1f} KB each)")
+
+            orders = self.spans.get("order", [])
+
+            if orders:
+                wall = max(start + seconds for start, seconds in orders) - min(start for start, _ in orders)
+                lines.append(f"throughput: {len(orders) / wall if wall > 0 else float('inf'):.2f} orders/s over {wall:.1f} s")
+
+        return "\n".join(lines)
+
+
+NO_TIMER = Timer(enabled=False)
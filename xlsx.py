@@ -0,0 +1,204 @@
+"""
+Module for streaming the rows of an xlsx workbook straight from its xml (without openpyxl)
+"""
+
+import re
+import posixpath
+import zipfile
+from datetime import date, datetime, time, timedelta
+from xml.etree.ElementTree import iterparse, parse
+
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+DATE_FORMAT_IDS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59)) # builtin date/time formats
+DATE_CODE = re.compile(r"[dmyhs]")
+QUOTED_OR_BRACKETED = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+CELL_COLUMN = re.compile(r"[A-Z]+")
+
+
+def column_index(ref):
+    """
+    Converts a cell reference ("C12") to a 0 based column index
+    """
+
+    index = 0
+
+    for c in CELL_COLUMN.match(ref).group():
+        index = index * 26 + ord(c) - ord("A") + 1
+
+    return index - 1
+
+
+def is_date_format(code):
+    """
+    Whether a custom number format code displays a date
+    """
+
+    return DATE_CODE.search(QUOTED_OR_BRACKETED.sub("", code.lower())) is not None
+
+
+def first_sheet_path(archive):
+    """
+    Finds the path of the active sheet in the archive
+    """
+
+    workbook = parse(archive.open("xl/workbook.xml")).getroot()
+    rels = parse(archive.open("xl/_rels/workbook.xml.rels")).getroot()
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{PKG_REL_NS}Relationship")}
+
+    view = workbook.find(f"{NS}bookViews/{NS}workbookView")
+    active = int(view.get("activeTab", 0)) if view is not None else 0
+    sheets = workbook.findall(f"{NS}sheets/{NS}sheet")
+    target = targets[sheets[active].get(f"{REL_NS}id")]
+
+    if target.startswith("/"):
+        return target[1:]
+
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def uses_1904_dates(archive):
+    """
+    Whether the workbook counts dates from 1904
+    """
+
+    workbook = parse(archive.open("xl/workbook.xml")).getroot()
+    props = workbook.find(f"{NS}workbookPr")
+
+    return props is not None and props.get("date1904") in ("1", "true")
+
+
+def load_shared_strings(archive):
+    """
+    Loads the shared string table
+    """
+
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+
+    strings = []
+
+    for _, elem in iterparse(archive.open("xl/sharedStrings.xml")):
+        if elem.tag == f"{NS}si":
+            strings.append("".join(t.text or "" for t in elem.iter(f"{NS}t")))
+            elem.clear()
+
+    return strings
+
+
+def load_date_styles(archive):
+    """
+    Returns the set of cell style indices that format numbers as dates
+    """
+
+    if "xl/styles.xml" not in archive.namelist():
+        return set()
+
+    styles = parse(archive.open("xl/styles.xml")).getroot()
+    date_formats = set(DATE_FORMAT_IDS)
+
+    for num_fmt in styles.iter(f"{NS}numFmt"):
+        if is_date_format(num_fmt.get("formatCode", "")):
+            date_formats.add(int(num_fmt.get("numFmtId")))
+
+    cell_xfs = styles.find(f"{NS}cellXfs")
+
+    if cell_xfs is None:
+        return set()
+
+    return {i for i, xf in enumerate(cell_xfs) if int(xf.get("numFmtId", 0)) in date_formats}
+
+
+def cast_number(value):
+    """
+    Converts a numeric cell to an int or float (the same way openpyxl does)
+    """
+
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+
+    return int(value)
+
+
+def parse_iso_date(value):
+    """
+    Converts an ISO 8601 date cell (t="d") to a date, time or datetime (the same way openpyxl does)
+    """
+
+    value = value.rstrip("Z")
+
+    if "T" in value:
+        return datetime.fromisoformat(value)
+
+    if ":" in value:
+        return time.fromisoformat(value)
+
+    return date.fromisoformat(value)
+
+
+def iter_rows(path, min_row=1):
+    """
+    Stream the rows of the active sheet as tuples of cell values, starting at row `min_row` (1 based)
+    Empty rows between filled ones are yielded as empty tuples
+    """
+
+    with zipfile.ZipFile(path) as archive:
+        strings = load_shared_strings(archive)
+        date_styles = load_date_styles(archive)
+        epoch = datetime(1904, 1, 1) if uses_1904_dates(archive) else datetime(1899, 12, 30)
+        next_row = min_row
+
+        for _, elem in iterparse(archive.open(first_sheet_path(archive))):
+            if elem.tag != f"{NS}row":
+                continue
+
+            row_num = int(elem.get("r", next_row))
+
+            if row_num < min_row:
+                elem.clear()
+                continue
+
+            while next_row < row_num:
+                yield ()
+                next_row += 1
+
+            values = []
+
+            for cell in elem.iter(f"{NS}c"):
+                ref = cell.get("r")
+                col = column_index(ref) if ref else len(values)
+                kind = cell.get("t", "n")
+                value = None
+
+                if kind == "inlineStr":
+                    inline = cell.find(f"{NS}is")
+
+                    if inline is not None: # a cell without its string is empty (like openpyxl)
+                        value = "".join(t.text or "" for t in inline.iter(f"{NS}t"))
+                else:
+                    raw = cell.findtext(f"{NS}v") or None # formulas without a cached value have an empty <v/>
+
+                    if raw is not None:
+                        if kind == "s":
+                            value = strings[int(raw)]
+                        elif kind == "b":
+                            value = bool(int(raw))
+                        elif kind in ("str", "e"):
+                            value = raw
+                        elif kind == "d":
+                            value = parse_iso_date(raw)
+                        else:
+                            value = cast_number(raw)
+
+                            if int(cell.get("s", 0)) in date_styles:
+                                value = epoch + timedelta(days=value)
+
+                values.extend([None] * (col + 1 - len(values)))
+                values[col] = value
+
+            elem.clear()
+            next_row = row_num + 1
+
+            yield tuple(values)